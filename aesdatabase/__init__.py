@@ -1,6 +1,7 @@
 from . import header, error
 from .drive import DriveSetup
 from .main import DatabaseEngine
+from .query import Col
 import os
 import time
 import shutil
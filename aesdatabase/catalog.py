@@ -0,0 +1,226 @@
+from .header import *
+from .crypto import CipherCache
+from .journal import Journal
+from .lock import FileLock
+
+
+class AttachmentCatalog(object):
+    """
+    Attachment entries by (name, file_name) kept in memory and logged to an encrypted journal,
+    entry: {'size', 'mtime', 'hash', 'row'}, None for unknown values,
+    an attachment stored by content has 'blob' too, blob references are counted from the entries,
+    processes sharing the catalog file take turns through a lock file next to it
+    """
+
+    def __init__(self, path: str, password: str = None, ciphers: CipherCache = None):
+        self.path = path
+        self.isLoaded = False
+        self.__entries = {}
+        self.__records = 0
+        self.__blobs = {}
+        self.__references = {}
+        self.__orphans = []
+        self.__journal = Journal(path, password, ciphers)
+
+        # The file lock is taken before the thread lock, an owner of the file lock may call any method
+        self.fileLock = FileLock('%s.lock' % path)
+        self.__lock = threading.Lock()
+
+    def __len__(self) -> int:
+        self.__refresh()
+
+        with self.__lock:
+            return len(self.__entries)
+
+    def __contains__(self, key: typing.Tuple[str, str]) -> bool:
+        self.__refresh()
+
+        with self.__lock:
+            return key in self.__entries
+
+    def get(self, name: str, file_name: str) -> typing.Optional[dict]:
+        """Get the entry of an attachment, the catalog is loaded again if another writer changed it"""
+
+        self.__refresh()
+
+        with self.__lock:
+            return self.__entries.get((name, file_name))
+
+    def items(self, name: str = None) -> typing.List[typing.Tuple[typing.Tuple[str, str], dict]]:
+        """Get ((name, file_name), entry) of all attachments or of a name"""
+
+        self.__refresh()
+
+        with self.__lock:
+            return [(key, entry) for key, entry in self.__entries.items() if name is None or key[0] == name]
+
+    def load(self) -> bool:
+        """
+        Load all entries, get False if the catalog file doesn't exist
+        :exception error.SignatureNotFoundError
+        :exception error.WrongKeyError
+        """
+
+        # Writers of other processes wait, a record being appended is not read half written
+        with self.fileLock.shared():
+            self.__entries.clear()
+            self.__records = 0
+            self.__blobs.clear()
+            self.__references.clear()
+
+            for record in self.__journal.read():
+                self.__apply(record)
+                self.__records += 1
+
+            self.isLoaded = self.__journal.generation is not None
+            return self.isLoaded
+
+    def add(self, name: str, file_name: str, entry: dict):
+        """
+        Add or replace the entry of an attachment
+        :exception PermissionError
+        """
+
+        with self.fileLock.exclusive(), self.__lock:
+            self.__sync()
+            self.__write([('add', name, file_name, entry)])
+
+    def link(self, name: str, file_name: str, entry: dict, blob: str = None) -> typing.Optional[str]:
+        """
+        Add or replace the entry of an attachment stored as a blob, a blob of the same hash is referenced
+        instead of the given one, get the referenced blob or None if there is neither
+        :exception PermissionError
+        """
+
+        with self.fileLock.exclusive(), self.__lock:
+            self.__sync()
+
+            if entry['hash'] is not None:
+                blob = self.__blobs.get(entry['hash'], blob)
+
+            if blob is not None:
+                self.__write([('add', name, file_name, dict(entry, blob=blob))])
+
+            return blob
+
+    def remove(self, name: str, file_name: str):
+        """
+        Remove the entry of an attachment
+        :exception PermissionError
+        """
+
+        with self.fileLock.exclusive(), self.__lock:
+            self.__sync()
+
+            if (name, file_name) in self.__entries:
+                self.__write([('remove', name, file_name)])
+
+    def orphans(self) -> typing.List[str]:
+        """
+        Get the blobs are not referenced anymore by the changes since the last call,
+        hold fileLock.exclusive() until they're removed, another process may reference them again otherwise
+        """
+
+        self.__refresh()
+
+        with self.__lock:
+            orphans, self.__orphans = self.__orphans, []
+
+        return [blob for blob in orphans if blob not in self.__references]
+
+    def reset(self, entries: typing.Dict[typing.Tuple[str, str], dict]):
+        """
+        Rewrite the catalog file with the entries only
+        :exception PermissionError
+        """
+
+        with self.fileLock.exclusive(), self.__lock:
+            self.__reset(entries)
+
+    def __refresh(self):
+        # A stat of the catalog file tells another writer changed it
+        if self.isLoaded and self.__journal.changed():
+            with self.fileLock.shared(), self.__lock:
+                if self.__journal.changed():
+                    self.load()
+
+    def __sync(self):
+        # Another engine changed the catalog file, continue from its content
+        if self.isLoaded and self.__journal.changed():
+            self.load()
+
+        if not self.isLoaded:
+            self.__reset({})
+
+    def __write(self, records: list):
+        for record in records:
+            self.__orphans.extend(self.__apply(record))
+
+        self.__journal.append([pickle.dumps(record) for record in records])
+        self.__records += len(records)
+
+        # Fold single changes into batches, loading many small records costs a decryption each
+        if self.__records > len(self.__entries) // batchSize + 1024:
+            self.__reset(dict(self.__entries))
+
+    def __reset(self, entries: dict):
+        items = list(entries.items())
+        records = [
+            pickle.dumps(('entries', None, None, items[i:i + batchSize])) for i in range(0, len(items), batchSize)
+        ]
+
+        self.__journal.reset(os.urandom(generationSize))
+        self.__journal.append(records)
+
+        blobs = list(self.__references)
+        self.__entries = {}
+        self.__blobs.clear()
+        self.__references.clear()
+        self.__apply(('entries', None, None, items))
+        self.__orphans.extend(blob for blob in blobs if blob not in self.__references)
+
+        self.__records = len(records)
+        self.isLoaded = True
+
+    def __apply(self, record: tuple) -> list:
+        operation, name, file_name, *args = record
+
+        if operation == 'add':
+            return self.__set((name, file_name), args[0])
+        elif operation == 'remove':
+            return self.__set((name, file_name), None)
+        elif operation == 'entries':
+            return [blob for key, entry in args[0] for blob in self.__set(key, entry)]
+
+        return []
+
+    def __set(self, key: typing.Tuple[str, str], entry: typing.Optional[dict]) -> list:
+        previous = self.__entries.pop(key, None) if entry is None else self.__entries.get(key)
+
+        if entry is not None:
+            self.__entries[key] = entry
+            self.__reference(entry, 1)
+
+        # Get the previous blob if it's not referenced anymore
+        if previous is not None and self.__reference(previous, -1) == 0:
+            return [previous['blob']]
+
+        return []
+
+    def __reference(self, entry: dict, count: int) -> typing.Optional[int]:
+        blob = entry.get('blob')
+        if blob is None:
+            return None
+
+        references = self.__references.get(blob, 0) + count
+
+        if references > 0:
+            self.__references[blob] = references
+            if entry['hash'] is not None:
+                self.__blobs.setdefault(entry['hash'], blob)
+        else:
+            self.__references.pop(blob, None)
+            if self.__blobs.get(entry['hash']) == blob:
+                del self.__blobs[entry['hash']]
+
+        return references
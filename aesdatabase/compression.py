@@ -0,0 +1,200 @@
+from .header import *
+from . import error
+
+
+class ZlibDecompressor(object):
+    """zlib decompressor with the interface of lzma.LZMADecompressor"""
+
+    def __init__(self):
+        self.__decompressor = zlib.decompressobj()
+
+    @property
+    def eof(self) -> bool:
+        return self.__decompressor.eof
+
+    @property
+    def needs_input(self) -> bool:
+        return not self.__decompressor.unconsumed_tail
+
+    def decompress(self, data: bytes, max_length: int = -1) -> bytes:
+        return self.__decompressor.decompress(self.__decompressor.unconsumed_tail + data, max(max_length, 0))
+
+
+# Compression methods by name: compressor factory by level ( None for default ), decompressor factory
+compressors = {
+    'zlib': (
+        lambda level: zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION if level is None else level), ZlibDecompressor
+    ),
+    'lzma': (
+        lambda level: lzma.LZMACompressor(preset=level), lzma.LZMADecompressor
+    ),
+}
+
+
+def compress(data: bytes, method: str, level: int = None) -> bytes:
+    """Compress data at once into the layout of CompressWriter"""
+
+    compressor = compressors[method][0](level)
+
+    return CompressWriter.magic + struct.pack('<B', compressionMethods[method]) + (
+        compressor.compress(data) + compressor.flush()
+    )
+
+
+def decompress(data: bytes) -> bytes:
+    """
+    Decompress data made by compress or CompressWriter at once
+    :exception error.SignatureNotFoundError
+    """
+
+    return DecompressReader(io.BytesIO(data)).readall()
+
+
+class CompressWriter(io.RawIOBase):
+    """
+    Compress a stream, file layout: magic, method id, then compressed data,
+    close() flushes the compressor, the underlying file is left open
+    """
+
+    magic = b'AESDatabaseCompressed'
+
+    def __init__(self, file: typing.BinaryIO, method: str, level: int = None):
+        super().__init__()
+        self.__file = file
+        self.__compressor = compressors[method][0](level)
+
+        self.__file.write(self.magic + struct.pack('<B', compressionMethods[method]))
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: bytes) -> int:
+        self.__file.write(self.__compressor.compress(data))
+
+        return len(data)
+
+    def close(self):
+        """Write the rest of compressed data, the underlying file is left open"""
+
+        if not self.closed:
+            self.__file.write(self.__compressor.flush())
+
+        super().close()
+
+
+class DecompressReader(io.RawIOBase):
+    """
+    Decompress a stream written by CompressWriter lazily, one chunk in memory at a time,
+    seek() decompresses again from the start to go backward, close_file=False leaves the file open on close()
+    """
+
+    magic = CompressWriter.magic
+
+    def __init__(self, file: typing.BinaryIO, close_file: bool = True):
+        super().__init__()
+        self.__file = file
+        self.__closeFile = close_file
+
+        if file.read(len(self.magic)) != self.magic:
+            raise error.SignatureNotFoundError("Signature not found")
+
+        method_id = file.read(1)
+        methods = {struct.pack('<B', value): method for method, value in compressionMethods.items()}
+        if method_id not in methods:
+            raise error.SignatureNotFoundError(f"Compression method {method_id.hex()} is not supported")
+
+        self.method = methods[method_id]
+        self.__start = file.tell()
+        self.__decompressor = compressors[self.method][1]()
+        self.__buffer = memoryview(b'')
+        self.__position = 0
+        self.__size = None
+
+    @classmethod
+    def is_compressed(cls, file: typing.BinaryIO) -> bool:
+        """Check the file starts with the compression magic, the file position is restored"""
+
+        position = file.tell()
+        magic = file.read(len(cls.magic))
+        file.seek(position)
+
+        return magic == cls.magic
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return self.__file.seekable()
+
+    def close(self):
+        """Close the reader and its file"""
+
+        if not self.closed and self.__closeFile:
+            self.__file.close()
+
+        super().close()
+
+    def tell(self) -> int:
+        return self.__position
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR:
+            offset += self.__position
+        elif whence == os.SEEK_END:
+            if self.__size is None:
+                # Decompress to the end once to know the size
+                while self.__skip(chunkSize):
+                    pass
+
+            offset += self.__size
+
+        if offset < 0:
+            raise ValueError(f"Negative seek position {offset}")
+
+        if offset < self.__position:
+            self.__file.seek(self.__start)
+            self.__decompressor = compressors[self.method][1]()
+            self.__buffer = memoryview(b'')
+            self.__position = 0
+
+        while self.__position < offset and self.__skip(offset - self.__position):
+            pass
+
+        return self.__position
+
+    def readinto(self, buffer: typing.Union[bytearray, memoryview]) -> int:
+        if not self.__buffer:
+            self.__buffer = memoryview(self.__decompress())
+
+        size = min(len(buffer), len(self.__buffer))
+        buffer[:size] = self.__buffer[:size]
+        self.__buffer = self.__buffer[size:]
+        self.__position += size
+
+        return size
+
+    def __skip(self, size: int) -> int:
+        if not self.__buffer:
+            self.__buffer = memoryview(self.__decompress())
+
+        size = min(size, len(self.__buffer))
+        self.__buffer = self.__buffer[size:]
+        self.__position += size
+
+        return size
+
+    def __decompress(self) -> bytes:
+        while not self.__decompressor.eof:
+            data = b''
+            if self.__decompressor.needs_input:
+                data = self.__file.read(chunkSize)
+                if not data:
+                    raise EOFError("Compressed data is truncated")
+
+            # Bounded output, a highly compressed chunk doesn't expand in memory at once
+            data = self.__decompressor.decompress(data, chunkSize)
+            if data:
+                return data
+
+        self.__size = self.__position + len(self.__buffer)
+        return b''
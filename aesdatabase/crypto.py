@@ -0,0 +1,264 @@
+from .header import *
+from . import error
+
+
+def derive_key(password: str, salt: bytes) -> bytes:
+    """Derive an AES-256 key from the password and salt"""
+
+    return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, keyIterations, 32)
+
+
+class Cipher(object):
+    """AES-256-GCM frames, the key is derived once from the password and salt"""
+
+    def __init__(self, password: str, salt: bytes = None):
+        if salt is None:
+            salt = os.urandom(saltSize)
+
+        self.salt = salt
+        self.__key = derive_key(password, salt)
+
+    def encrypt(self, data: bytes, associated_data: bytes = b'') -> bytes:
+        """Encrypt data into a frame: nonce + ciphertext + tag"""
+
+        nonce = os.urandom(nonceSize)
+        cipher = AES.new(self.__key, AES.MODE_GCM, nonce=nonce)
+        cipher.update(associated_data)
+        data, tag = cipher.encrypt_and_digest(data)
+
+        return nonce + data + tag
+
+    def decrypt(self, frame: bytes, associated_data: bytes = b'') -> bytes:
+        """
+        Decrypt a frame made by encrypt
+        :exception error.WrongKeyError
+        """
+
+        frame = memoryview(frame)
+        cipher = AES.new(self.__key, AES.MODE_GCM, nonce=bytes(frame[:nonceSize]))
+        cipher.update(associated_data)
+
+        try:
+            return cipher.decrypt_and_verify(frame[nonceSize:-tagSize], frame[-tagSize:])
+        except ValueError:
+            raise error.WrongKeyError("Wrong key or corrupted data")
+
+
+class CipherCache(object):
+    """
+    Ciphers by password and salt, a key is derived once per pair until clear(),
+    new data of a password is encrypted by one cipher with a random salt
+    """
+
+    def __init__(self, size: int = None):
+        self.size = size or keyCacheSize
+        self.__ciphers = {}
+        self.__writers = {}
+        self.__lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.__ciphers)
+
+    def get(self, password: str, salt: bytes = None) -> Cipher:
+        """Get the cipher of a salt, or the cipher to encrypt new data if salt is None"""
+
+        if salt is None:
+            cipher = self.__writers.get(password)
+            if cipher is None:
+                cipher = self.__writers.setdefault(password, self.__add(password, Cipher(password)))
+
+            return cipher
+
+        cipher = self.__ciphers.get((password, salt))
+        if cipher is None:
+            # Derive outside the lock, other threads keep using cached keys meanwhile
+            cipher = self.__add(password, Cipher(password, salt))
+
+        return cipher
+
+    def clear(self):
+        """Forget all derived keys, new data gets a new salt"""
+
+        with self.__lock:
+            self.__ciphers.clear()
+            self.__writers.clear()
+
+    def __add(self, password: str, cipher: Cipher) -> Cipher:
+        with self.__lock:
+            while len(self.__ciphers) >= self.size:
+                # Drop the oldest key
+                del self.__ciphers[next(iter(self.__ciphers))]
+
+            return self.__ciphers.setdefault((password, cipher.salt), cipher)
+
+
+class CipherWriter(io.RawIOBase):
+    """
+    Encrypt a stream into chunk frames, file layout: magic, version, chunk size, salt, random stream id,
+    then frames of final flag, size, nonce, ciphertext and tag, close() writes the final frame,
+    a frame is bound to the header and its index so frames of other streams of the same key don't fit
+    """
+
+    magic = b'AESDatabaseStream'
+    version = 2
+
+    def __init__(self, file: typing.BinaryIO, cipher: Cipher, chunk_size: int = None):
+        super().__init__()
+        self.__file = file
+        self.__cipher = cipher
+        self.__chunkSize = chunk_size or chunkSize
+        self.__buffer = bytearray()
+        self.__index = 0
+
+        self.__header = self.magic + struct.pack('<BI', self.version, self.__chunkSize) + cipher.salt
+        self.__header += os.urandom(streamIdSize)
+        self.__file.write(self.__header)
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: bytes) -> int:
+        self.__buffer += data
+
+        while len(self.__buffer) > self.__chunkSize:
+            self.__write_frame(bytes(self.__buffer[:self.__chunkSize]), False)
+            del self.__buffer[:self.__chunkSize]
+
+        return len(data)
+
+    def close(self):
+        """Write the final frame, the underlying file is left open"""
+
+        if not self.closed:
+            self.__write_frame(bytes(self.__buffer), True)
+            self.__buffer.clear()
+
+        super().close()
+
+    def __write_frame(self, data: bytes, final: bool):
+        frame = self.__cipher.encrypt(data, self.__header + struct.pack('<QB', self.__index, final))
+        self.__file.write(struct.pack('<BI', final, len(frame)) + frame)
+        self.__index += 1
+
+
+class CipherReader(io.RawIOBase):
+    """
+    Decrypt chunk frames written by CipherWriter lazily, one frame in memory at a time,
+    frames have a fixed size so seek() jumps to the frame of a position without reading the ones before
+    """
+
+    magic = CipherWriter.magic
+    frameOverhead = struct.calcsize('<BI') + nonceSize + tagSize
+
+    def __init__(self, file: typing.BinaryIO, password: str, ciphers: CipherCache = None):
+        super().__init__()
+        self.__file = file
+
+        if file.read(len(self.magic)) != self.magic:
+            raise error.SignatureNotFoundError("Signature not found")
+
+        version_data = file.read(struct.calcsize('<BI'))
+        version, self.chunkSize = struct.unpack('<BI', version_data)
+        if version != CipherWriter.version:
+            raise error.SignatureNotFoundError(f"Stream version {version} is not supported")
+
+        salt = file.read(saltSize)
+        self.__header = self.magic + version_data + salt + file.read(streamIdSize)
+        self.__cipher = ciphers.get(password, salt) if ciphers is not None else Cipher(password, salt)
+        self.__start = file.tell()
+        self.__buffer = memoryview(b'')
+        self.__index = 0
+        self.__skip = 0
+        self.__position = 0
+        self.__final = False
+
+    @classmethod
+    def is_stream(cls, file: typing.BinaryIO) -> bool:
+        """Check the file starts with the stream magic, the file position is restored"""
+
+        position = file.tell()
+        magic = file.read(len(cls.magic))
+        file.seek(position)
+
+        return magic == cls.magic
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return self.__file.seekable()
+
+    def close(self):
+        """Close the reader and its file"""
+
+        if not self.closed:
+            self.__file.close()
+
+        super().close()
+
+    def tell(self) -> int:
+        return self.__position
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR:
+            offset += self.__position
+        elif whence == os.SEEK_END:
+            offset += self.__size()
+
+        if offset < 0:
+            raise ValueError(f"Negative seek position {offset}")
+
+        if offset >= self.__size():
+            self.__buffer = memoryview(b'')
+            self.__final = True
+        else:
+            # Read the frame of the position on the next read
+            self.__index, self.__skip = divmod(offset, self.chunkSize)
+            self.__file.seek(self.__start + self.__index * (self.chunkSize + self.frameOverhead))
+            self.__buffer = memoryview(b'')
+            self.__final = False
+
+        self.__position = offset
+        return offset
+
+    def readinto(self, buffer: typing.Union[bytearray, memoryview]) -> int:
+        while not self.__buffer:
+            if self.__final:
+                return 0
+
+            self.__buffer = memoryview(self.__read_frame())[self.__skip:]
+            self.__skip = 0
+
+        size = min(len(buffer), len(self.__buffer))
+        buffer[:size] = self.__buffer[:size]
+        self.__buffer = self.__buffer[size:]
+        self.__position += size
+
+        return size
+
+    def __size(self) -> int:
+        frames, rest = divmod(self.__file.seek(0, os.SEEK_END) - self.__start, self.chunkSize + self.frameOverhead)
+        self.__file.seek(self.__start + self.__index * (self.chunkSize + self.frameOverhead))
+
+        # Only the final frame may be shorter than a chunk
+        if rest:
+            return frames * self.chunkSize + rest - self.frameOverhead
+
+        return frames * self.chunkSize
+
+    def __read_frame(self) -> bytes:
+        header_size = struct.calcsize('<BI')
+        header = self.__file.read(header_size)
+        if len(header) < header_size:
+            raise error.WrongKeyError("Stream is truncated")
+
+        final, size = struct.unpack('<BI', header)
+        frame = self.__file.read(size)
+        if len(frame) < size:
+            raise error.WrongKeyError("Stream is truncated")
+
+        data = self.__cipher.decrypt(frame, self.__header + struct.pack('<QB', self.__index, final))
+        self.__final = bool(final)
+        self.__index += 1
+
+        return data
@@ -1,12 +1,33 @@
 from .header import *
+from . import error
 
 
 class DriveSetup:
-    def __init__(self, add_attachment: bool = False, add_backup: bool = False):
+    def __init__(
+            self, add_attachment: bool = False, add_backup: bool = False,
+            compression: str = None, compression_level: int = None
+    ):
         self.isAttachment = add_attachment
         self.isBackup = add_backup
         self.isCreated = False
 
+        # Database, backup rows and attachments are compressed before encryption: 'zlib' or 'lzma'
+        if compression is not None and compression not in compressionMethods:
+            raise error.CompressionMethodError(f"Compression method {compression} is not supported")
+
+        if compression is not None and compression_level is not None:
+            level = compression_level
+            if compression == 'lzma' and isinstance(level, int):
+                level &= ~lzma.PRESET_EXTREME
+
+            if not isinstance(level, int) or level not in compressionLevels[compression]:
+                raise error.CompressionMethodError(
+                    f"Compression level {compression_level} is not supported by {compression}"
+                )
+
+        self.compression = compression
+        self.compressionLevel = compression_level
+
         # Database directory
         self.__databaseFolderName = None
         self.__databaseFileName = None
@@ -14,6 +35,9 @@ class DriveSetup:
         self.databaseSignature = None
         self.databaseDir = None
         self.databasePath = None
+        self.journalPath = None
+        self.lockPath = None
+        self.tableDir = None
         self.database_update(
             main='', folder='database', file='database', extension='db', signature=b'AESDatabase'
         )
@@ -28,6 +52,8 @@ class DriveSetup:
         # Attachments directory
         self.__attachmentFolderName = None
         self.attachmentDir = None
+        self.catalogPath = None
+        self.blobDir = None
         self.attachment_update(
             main=self.databaseDir, folder='attachments'
         )
@@ -63,6 +89,11 @@ class DriveSetup:
         self.databasePath = os.path.join(
             self.databaseDir, '%s.%s' % (self.__databaseFileName, self.__databaseExtension)
         )
+        self.journalPath = '%s.journal' % self.databasePath
+        self.lockPath = '%s.lock' % self.databasePath
+
+        # Named tables are saved as separate database files
+        self.tableDir = os.path.join(self.databaseDir, 'tables')
 
         try:
             if previous_dir == os.path.dirname(self.attachmentDir):
@@ -85,6 +116,8 @@ class DriveSetup:
             self.__attachmentFolderName = folder
 
         self.attachmentDir = os.path.join(main, self.__attachmentFolderName)
+        self.catalogPath = '%s.catalog' % self.attachmentDir
+        self.blobDir = '%s.blobs' % self.attachmentDir
 
     def backup_update(
             self, main: str = None, folder: str = None, file: str = None,
@@ -106,6 +139,24 @@ class DriveSetup:
             self.backupDir, '%s.%s' % (self.__backupFileName, self.__backupExtension)
         )
 
+    def table(self, name: str) -> 'DriveSetup':
+        """
+        Get a drive of a named table, its database file is in the tables directory, the other directories are shared
+        :exception error.TableNameError
+        """
+
+        if not isinstance(name, str) or not re.fullmatch(r'[\w-]+', name):
+            raise error.TableNameError(f"{name} is not a valid table name, use letters, digits, _ and -")
+
+        drive = copy.copy(self)
+        drive.databaseDir = self.tableDir
+        drive.databasePath = os.path.join(self.tableDir, '%s.%s' % (name, self.__databaseExtension))
+        drive.journalPath = '%s.journal' % drive.databasePath
+        drive.lockPath = '%s.lock' % drive.databasePath
+        drive.isCreated = False
+
+        return drive
+
     def create(self) -> list:
         """
         Create all directories are configured
@@ -153,6 +204,15 @@ class DriveSetup:
             self.__remove_dir(self.attachmentDir)
             result.append(self.attachmentDir)
 
+        if attachment and self.isAttachment and os.path.exists(self.catalogPath):
+            os.remove(self.catalogPath)
+
+        if attachment and self.isAttachment and os.path.exists('%s.lock' % self.catalogPath):
+            os.remove('%s.lock' % self.catalogPath)
+
+        if attachment and self.isAttachment and os.path.exists(self.blobDir):
+            self.__remove_dir(self.blobDir)
+
         if backup and self.isBackup and os.path.exists(self.backupDir):
             self.__remove_dir(self.backupDir)
             result.append(self.backupDir)
@@ -2,6 +2,10 @@ class TableCreationError(Exception):
     """Table creation error"""
 
 
+class TableNameError(Exception):
+    """Table name error"""
+
+
 class TableTitleError(Exception):
     """Table title error"""
 
@@ -18,6 +22,18 @@ class RowNotFoundError(Exception):
     """Row not found error"""
 
 
+class QueryError(Exception):
+    """Query error"""
+
+
+class IndexCreationError(Exception):
+    """Index creation error"""
+
+
+class MergePolicyError(Exception):
+    """Merge policy error"""
+
+
 class AttachmentStatusError(Exception):
     """Attachments status error"""
 
@@ -26,5 +42,13 @@ class BackupStatusError(Exception):
     """Backup status error"""
 
 
+class CompressionMethodError(Exception):
+    """Compression method error"""
+
+
 class SignatureNotFoundError(Exception):
     """Signature not found error"""
+
+
+class WrongKeyError(Exception):
+    """Wrong key error"""
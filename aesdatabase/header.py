@@ -1,12 +1,70 @@
 import os
+import abc
 import time
 import shutil
 import typing
 import struct
 import pickle
+import bisect
+import array
+import operator
+import heapq
+import itertools
+import hashlib
+import zlib
+import lzma
+import io
+import re
+import copy
+import mmap
+import collections
+import contextlib
+import functools
+import sys
+import threading
+import concurrent.futures
 import aescrypto
+from Crypto.Cipher import AES
+
+try:
+    import fcntl
+except ImportError:
+    # Windows has no fcntl, database files are not locked between processes there
+    fcntl = None
 
 
 chunkSize = 1024 * 1024
 if 'ANDROID_ROOT' in os.environ:
     chunkSize = 1024 * 64
+
+# Database file format written by dump, version 1 files have no version byte, version 3 body may be compressed
+databaseVersion = 3
+generationSize = 16
+
+# Backup file format written by dump_backup, version 1 has no index of entry offsets, version 3 rows may be compressed
+backupVersion = 3
+
+# Rows are pickled in batches of this size, memory of a dump or load stays the same for any table size
+batchSize = 4096
+
+# Paged database files hold rows in pages of this size, only the recently read pages stay decrypted in memory
+# within the cache budget in bytes, the memory of a page is estimated from a sample of its rows
+pageRows = 1024
+pageCacheBytes = 64 * 1024 * 1024
+pageSizeSamples = 32
+
+# Compression methods before encryption by id in the compression header
+compressionMethods = {'zlib': 1, 'lzma': 2}
+
+# Valid compression levels by method, lzma presets may also set lzma.PRESET_EXTREME
+compressionLevels = {'zlib': range(-1, 10), 'lzma': range(0, 10)}
+
+# AES-256-GCM frames, the key is derived from the password with PBKDF2-SHA256
+saltSize = 16
+streamIdSize = 16
+nonceSize = 12
+tagSize = 16
+keyIterations = 100000
+
+# Derived keys kept by an engine, keyed by password and salt
+keyCacheSize = 64
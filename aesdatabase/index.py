@@ -0,0 +1,203 @@
+from .header import *
+
+
+class HashIndex(object):
+    """Value to row indexes map for equality lookups"""
+
+    def __init__(self, title: str):
+        self.title = title
+        self.isDirty = True
+        self.__map = {}
+
+    def build(self, values: typing.Iterable):
+        """
+        Rebuild the index from all column values ordered by row index
+        :exception TypeError
+        """
+
+        index_map = {}
+
+        for row_index, value in enumerate(values):
+            try:
+                index_map[value].append(row_index)
+            except KeyError:
+                index_map[value] = [row_index]
+
+        self.__map = index_map
+        self.isDirty = False
+
+    def add(self, value: typing.Any, row_index: int):
+        """Add a row index for a value"""
+
+        row_indexes = self.__map.setdefault(value, [])
+        if not row_indexes or row_indexes[-1] < row_index:
+            row_indexes.append(row_index)
+        else:
+            bisect.insort(row_indexes, row_index)
+
+    def discard(self, value: typing.Any, row_index: int):
+        """Discard a row index for a value"""
+
+        row_indexes = self.__map.get(value)
+        if not row_indexes:
+            return
+
+        try:
+            row_indexes.remove(row_index)
+        except ValueError:
+            return
+
+        if not row_indexes:
+            del self.__map[value]
+
+    def shift(self, row_index: int, offset: int):
+        """Shift all row indexes from row_index and above by offset"""
+
+        for row_indexes in self.__map.values():
+            if row_indexes[-1] < row_index:
+                continue
+
+            row_indexes[:] = [i + offset if i >= row_index else i for i in row_indexes]
+
+    def lookup(self, value: typing.Any) -> tuple:
+        """
+        Get all row indexes contain the value
+        :exception TypeError
+        """
+
+        return tuple(self.__map.get(value, ()))
+
+    def clear(self):
+        """Clear all values"""
+
+        self.__map.clear()
+        self.isDirty = False
+
+
+class SortedIndex(object):
+    """Sorted values with their row indexes for range lookups and ordering"""
+
+    def __init__(self, title: str):
+        self.title = title
+        self.isDirty = True
+        self.__values = []
+        self.__rowIndexes = []
+
+    def __len__(self) -> int:
+        return len(self.__values)
+
+    def build(self, values: typing.Iterable):
+        """
+        Rebuild the index from all column values ordered by row index
+        :exception TypeError
+        """
+
+        pairs = sorted((value, row_index) for row_index, value in enumerate(values))
+        self.__values = [value for value, _ in pairs]
+        self.__rowIndexes = [row_index for _, row_index in pairs]
+        self.isDirty = False
+
+    def add(self, value: typing.Any, row_index: int):
+        """Add a row index for a value"""
+
+        position = self.__position(value, row_index)
+        self.__values.insert(position, value)
+        self.__rowIndexes.insert(position, row_index)
+
+    def discard(self, value: typing.Any, row_index: int):
+        """Discard a row index for a value"""
+
+        position = self.__position(value, row_index)
+
+        if position < len(self.__values) and self.__rowIndexes[position] == row_index:
+            del self.__values[position]
+            del self.__rowIndexes[position]
+
+    def shift(self, row_index: int, offset: int):
+        """Shift all row indexes from row_index and above by offset"""
+
+        self.__rowIndexes = [i + offset if i >= row_index else i for i in self.__rowIndexes]
+
+    def lookup(self, value: typing.Any) -> tuple:
+        """
+        Get all row indexes contain the value
+        :exception TypeError
+        """
+
+        return self.range(value, value)
+
+    def range(
+            self, low: typing.Any = None, high: typing.Any = None, include_low: bool = True, include_high: bool = True
+    ) -> tuple:
+        """
+        Get row indexes of values between low and high ordered by value, None means unbounded
+        :exception TypeError
+        """
+
+        start = 0
+        if low is not None:
+            start = (bisect.bisect_left if include_low else bisect.bisect_right)(self.__values, low)
+
+        stop = len(self.__values)
+        if high is not None:
+            stop = (bisect.bisect_right if include_high else bisect.bisect_left)(self.__values, high, start)
+
+        return tuple(self.__rowIndexes[start:stop])
+
+    def prefix(self, prefix: str) -> tuple:
+        """
+        Get row indexes of str values start with prefix ordered by value
+        :exception TypeError
+        """
+
+        start = bisect.bisect_left(self.__values, prefix)
+        stop = len(self.__values)
+
+        # The first str greater than every str starts with prefix
+        upper = prefix.rstrip(chr(sys.maxunicode))
+        if upper:
+            upper = upper[:-1] + chr(ord(upper[-1]) + 1)
+            stop = bisect.bisect_left(self.__values, upper, start)
+
+        return tuple(self.__rowIndexes[start:stop])
+
+    def ordered(self, reverse: bool = False) -> typing.Iterator[int]:
+        """Get all row indexes ordered by value, equal values keep row index order"""
+
+        if not reverse:
+            yield from self.__rowIndexes
+            return
+
+        stop = len(self.__values)
+        while stop:
+            start = bisect.bisect_left(self.__values, self.__values[stop - 1], 0, stop)
+            yield from self.__rowIndexes[start:stop]
+            stop = start
+
+    def min(self) -> typing.Any:
+        """
+        Get the lowest value
+        :exception IndexError
+        """
+
+        return self.__values[0]
+
+    def max(self) -> typing.Any:
+        """
+        Get the highest value
+        :exception IndexError
+        """
+
+        return self.__values[-1]
+
+    def clear(self):
+        """Clear all values"""
+
+        self.__values.clear()
+        self.__rowIndexes.clear()
+        self.isDirty = False
+
+    def __position(self, value: typing.Any, row_index: int) -> int:
+        start = bisect.bisect_left(self.__values, value)
+        stop = bisect.bisect_right(self.__values, value, start)
+        return bisect.bisect_left(self.__rowIndexes, row_index, start, stop)
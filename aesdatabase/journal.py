@@ -0,0 +1,185 @@
+from .header import *
+from .crypto import CipherCache
+from .lock import temp_file_path
+from . import error
+
+
+class Journal(object):
+    """
+    Append-only log of table changes made after the last snapshot,
+    file layout: magic, encrypted flag, snapshot generation, salt, then size-prefixed records,
+    an encrypted record is bound to the header and its sequence number
+    """
+
+    magic = b'AESDatabaseJournal'
+
+    def __init__(self, path: str, password: str = None, ciphers: CipherCache = None):
+        self.path = path
+        self.generation = None
+        self.__password = password
+        self.__ciphers = ciphers if ciphers is not None else CipherCache()
+        self.__cipher = None
+        self.__header = b''
+        self.__end = 0
+        self.__sequence = 0
+        self.__identity = None
+
+    def reset(self, generation: bytes):
+        """
+        Start an empty journal for a snapshot generation
+        :exception PermissionError
+        """
+
+        header = self.magic + struct.pack('<B', bool(self.__password)) + generation
+
+        if self.__password:
+            self.__cipher = self.__ciphers.get(self.__password)
+            header += self.__cipher.salt
+
+        temp_path = temp_file_path(self.path)
+        with open(temp_path, 'wb') as file:
+            file.write(header)
+            file.flush()
+            os.fsync(file.fileno())
+
+        os.replace(temp_path, self.path)
+
+        self.generation = generation
+        self.__header = header
+        self.__end = len(header)
+        self.__sequence = 0
+        self.__identity = self.__stat()
+
+    def read(self, resume: bool = False) -> typing.Iterator[tuple]:
+        """
+        Read all records, or only the records appended since the last read or write if resume,
+        a torn record at the end by a crash is ignored
+        :exception error.SignatureNotFoundError
+        :exception error.WrongKeyError
+        """
+
+        if not resume:
+            self.generation = None
+            self.__end = 0
+            self.__sequence = 0
+            self.__identity = None
+
+        try:
+            file = open(self.path, 'rb')
+        except FileNotFoundError:
+            return
+
+        with file:
+            if resume:
+                file.seek(self.__end)
+            else:
+                self.__read_header(file)
+            size_length = struct.calcsize('<I')
+
+            while True:
+                size = file.read(size_length)
+                if len(size) < size_length:
+                    break
+
+                size = struct.unpack('<I', size)[0]
+                data = file.read(size)
+                if len(data) < size:
+                    break
+
+                if self.__cipher is not None:
+                    data = self.__cipher.decrypt(data, self.__header + struct.pack('<Q', self.__sequence))
+
+                self.__end = file.tell()
+                self.__sequence += 1
+                self.__identity = (os.fstat(file.fileno()).st_ino, self.__end)
+                yield pickle.loads(data)
+
+    def append(self, records: typing.List[bytes]) -> int:
+        """
+        Append pickled records and flush them to the drive, get the journal size
+        :exception PermissionError
+        """
+
+        with open(self.path, 'r+b') as file:
+            # Drop a torn record left by a crash before appending
+            file.truncate(self.__end)
+            file.seek(self.__end)
+
+            for data in records:
+                if self.__cipher is not None:
+                    data = self.__cipher.encrypt(data, self.__header + struct.pack('<Q', self.__sequence))
+
+                file.write(struct.pack('<I', len(data)))
+                file.write(data)
+                self.__sequence += 1
+
+            file.flush()
+            os.fsync(file.fileno())
+            self.__end = file.tell()
+            self.__identity = (os.fstat(file.fileno()).st_ino, self.__end)
+
+        return self.__end
+
+    def changed(self) -> bool:
+        """Check the file was replaced or appended by another writer since it's read or written here"""
+
+        return self.__stat() != self.__identity
+
+    def appended(self) -> bool:
+        """Check records were only appended by another writer since the file is read or written here"""
+
+        stat = self.__stat()
+
+        return stat is not None and self.__identity is not None and (
+            stat[0] == self.__identity[0] and stat[1] > self.__identity[1]
+        )
+
+    def size(self) -> int:
+        """Get size of the valid journal part"""
+
+        return self.__end
+
+    def delete(self):
+        """Delete the journal file"""
+
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+        self.generation = None
+        self.__header = b''
+        self.__end = 0
+        self.__sequence = 0
+        self.__identity = None
+
+    def __stat(self) -> typing.Optional[tuple]:
+        try:
+            return os.stat(self.path).st_ino, os.path.getsize(self.path)
+        except FileNotFoundError:
+            return None
+
+    def __read_header(self, file: typing.BinaryIO):
+        if file.read(len(self.magic)) != self.magic:
+            raise error.SignatureNotFoundError("Signature not found")
+
+        encrypted = struct.unpack('<B', file.read(1))[0]
+        generation = file.read(generationSize)
+
+        self.__cipher = None
+        if encrypted:
+            if not self.__password:
+                raise error.WrongKeyError("Journal is encrypted, password is required")
+
+            self.__cipher = self.__ciphers.get(self.__password, file.read(saltSize))
+
+        elif self.__password:
+            # A journal written without the key must not change an encrypted database
+            raise error.WrongKeyError("Journal is not encrypted")
+
+        self.generation = generation
+        self.__header = self.magic + struct.pack('<B', encrypted) + generation + (
+            self.__cipher.salt if self.__cipher is not None else b''
+        )
+        self.__end = file.tell()
+        self.__identity = (os.fstat(file.fileno()).st_ino, self.__end)
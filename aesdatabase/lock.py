@@ -0,0 +1,184 @@
+from .header import *
+
+
+class ReadWriteLock(object):
+    """
+    Many readers or one writer, a waiting writer blocks new readers so writes are not starved,
+    a thread may read or write again while it holds the lock, but it can't write while it only reads
+    """
+
+    def __init__(self):
+        self.__condition = threading.Condition(threading.Lock())
+        self.__readers = {}
+        self.__writer = None
+        self.__writes = 0
+        self.__waitingWriters = 0
+
+    @contextlib.contextmanager
+    def read(self):
+        """Hold the lock shared with other readers"""
+
+        thread = threading.get_ident()
+
+        with self.__condition:
+            # Nested reads and reads of the writer don't wait, they would wait for themselves
+            if thread not in self.__readers and self.__writer != thread:
+                while self.__writer is not None or self.__waitingWriters:
+                    self.__condition.wait()
+
+            self.__readers[thread] = self.__readers.get(thread, 0) + 1
+
+        try:
+            yield
+        finally:
+            with self.__condition:
+                self.__readers[thread] -= 1
+                if not self.__readers[thread]:
+                    del self.__readers[thread]
+                    self.__condition.notify_all()
+
+    @contextlib.contextmanager
+    def write(self):
+        """
+        Hold the lock exclusively
+        :exception RuntimeError
+        """
+
+        thread = threading.get_ident()
+
+        with self.__condition:
+            if self.__writer != thread:
+                if thread in self.__readers:
+                    raise RuntimeError("A read lock can't be upgraded to a write lock")
+
+                self.__waitingWriters += 1
+                try:
+                    while self.__writer is not None or self.__readers:
+                        self.__condition.wait()
+                finally:
+                    self.__waitingWriters -= 1
+
+                self.__writer = thread
+
+            self.__writes += 1
+
+        try:
+            yield
+        finally:
+            with self.__condition:
+                self.__writes -= 1
+                if not self.__writes:
+                    self.__writer = None
+                    self.__condition.notify_all()
+
+
+class NullLock(object):
+    """Same interface as ReadWriteLock without locking, for engines used by one thread"""
+
+    @staticmethod
+    def read() -> typing.ContextManager:
+        return contextlib.nullcontext()
+
+    @staticmethod
+    def write() -> typing.ContextManager:
+        return contextlib.nullcontext()
+
+
+def reading(method: typing.Callable) -> typing.Callable:
+    """Run a method holding the read lock of its object"""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock.read():
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+def writing(method: typing.Callable) -> typing.Callable:
+    """Run a method holding the write lock of its object"""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock.write():
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+class FileLock(object):
+    """
+    Advisory lock shared by processes through flock on a lock file, shared by readers and exclusive for a writer,
+    the owner may lock again while it holds the lock, threads of a process hold it one at a time,
+    nothing is locked between processes without fcntl ( Windows )
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.__file = None
+        self.__modes = []
+        self.__threadLock = threading.RLock()
+
+    def shared(self) -> typing.ContextManager:
+        """Hold the lock shared with other processes reading"""
+
+        return self.__hold(False)
+
+    def exclusive(self) -> typing.ContextManager:
+        """
+        Hold the lock exclusively, waits for the other processes
+        :exception PermissionError
+        """
+
+        return self.__hold(True)
+
+    @contextlib.contextmanager
+    def __hold(self, exclusive: bool):
+        # One flock is held per process, the modes of the holding thread decide it
+        with self.__threadLock:
+            if fcntl is None:
+                yield
+            else:
+                with self.__flock(exclusive):
+                    yield
+
+    @contextlib.contextmanager
+    def __flock(self, exclusive: bool):
+        # A nested shared lock keeps an exclusive lock held already
+        previous = self.__modes[-1] if self.__modes else None
+        exclusive = exclusive or bool(previous)
+
+        if self.__file is None:
+            self.__file = open(self.path, 'a+b')
+
+        try:
+            if exclusive != previous:
+                fcntl.flock(self.__file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+
+            self.__modes.append(exclusive)
+
+        except BaseException:
+            if not self.__modes:
+                self.__release()
+            raise
+
+        try:
+            yield
+        finally:
+            self.__modes.pop()
+
+            if not self.__modes:
+                self.__release()
+            elif self.__modes[-1] != exclusive:
+                fcntl.flock(self.__file.fileno(), fcntl.LOCK_SH)
+
+    def __release(self):
+        fcntl.flock(self.__file.fileno(), fcntl.LOCK_UN)
+        self.__file.close()
+        self.__file = None
+
+
+def temp_file_path(path: str) -> str:
+    """Get a path next to a file to write it before renaming, unique across processes and threads"""
+
+    return '%s.%s.tmp' % (path, os.urandom(8).hex())
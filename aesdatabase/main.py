@@ -1,19 +1,71 @@
 from .header import *
 from .drive import DriveSetup
+from .index import HashIndex, SortedIndex
+from .storage import RowStorage, ColumnStorage
+from .query import Row, Predicate, row_factory
+from .journal import Journal
+from .crypto import Cipher, CipherCache, CipherReader, CipherWriter
+from .compression import CompressWriter, DecompressReader, compress
+from .catalog import AttachmentCatalog
+from .pages import PageCache, PageFile, PageWriter, PagedStorage
+from .lock import ReadWriteLock, NullLock, FileLock, reading, writing, temp_file_path
 from . import error
 
 
 class DatabaseEngine(object):
-    def __init__(self, drive: DriveSetup, password: str = None):
+    def __init__(
+            self, drive: DriveSetup, password: str = None, columnar: bool = False, journal: bool = False,
+            deduplicate: bool = False, paged: bool = False, cache_bytes: int = None, thread_safe: bool = False
+    ):
         self.__drive = drive
         self.__password = password
         self.__columns = []
-        self.__rows = []
+        self.__indexes = {}
 
         self.isEncrypted = False
         if password:
             self.isEncrypted = True
 
+        # Keys derived from passwords are reused by all operations until clear_key_cache()
+        self.__ciphers = CipherCache()
+
+        # Attachment entries are listed from the catalog, it's loaded on the first attachment call
+        self.__catalog = None
+
+        # Deduplicated attachments are stored once per content as blobs, every name references its blob
+        self.isDeduplicated = deduplicate
+
+        # Columnar storage keeps one typed container per column instead of a list per row
+        self.isColumnar = columnar
+
+        # Paged storage reads rows of the database file on demand, a paged file is opened without reading rows
+        self.isPaged = paged
+        self.__storage = self.__create_storage()
+
+        # Decrypted pages are kept within a budget in bytes of memory, tables bigger than memory are read page by page
+        self.__pages = PageCache(cache_bytes)
+
+        # Journaled dump appends the changes made after the last snapshot instead of rewriting it
+        self.isJournaled = journal
+        self.__journal = Journal(drive.journalPath, password, self.__ciphers) if journal else None
+        self.__pending = []
+        self.__generation = None
+
+        # Processes sharing the drive take turns on the database files, identity of the loaded file tells changes,
+        # hold fileLock.exclusive() to reload, change and dump without another process in between
+        self.fileLock = FileLock(drive.lockPath)
+        self.__identity = None
+
+        # Engines of named tables by name, a table is loaded on its first access only
+        self.__tables = {}
+
+        # Thread safe engine lets many threads read at once and one thread change it,
+        # hold lock.write() to make several changes at once
+        self.isThreadSafe = thread_safe
+        self.lock = ReadWriteLock() if thread_safe else NullLock()
+        self.__indexLock = threading.Lock()
+
+    @writing
     def create_table(self, column_titles: list):
         """
         Create a table, EX: column_titles=['username', 'password']
@@ -30,10 +82,12 @@ class DatabaseEngine(object):
                 raise error.TableCreationError(f"{title} type expected str, but got {type(title)}")
 
         self.__columns = column_titles
+        self.__storage = self.__create_storage()
 
-    def insert(self, row_index: int = 0, **kwargs):
+    @writing
+    def insert(self, row_index: int = None, **kwargs):
         """
-        Insert a new row in the table
+        Insert a new row in the table ( by default = append at the end )
         :exception error.TableCreationError
         :exception error.TableTitleError
         :exception error.RowItemError
@@ -51,29 +105,109 @@ class DatabaseEngine(object):
             except KeyError:
                 raise error.TableTitleError(f"Please define {title} value")
 
-        self.__rows.insert(row_index, row)
+        if row_index is None or row_index >= len(self.__storage):
+            self.__log('extend', [row])
+            self.__index_extend(len(self.__storage), [row])
+            self.__storage.append(row)
+            return
+
+        if row_index < 0:
+            row_index = max(len(self.__storage) + row_index, 0)
+
+        self.__log('insert', row_index, row)
+        self.__index_shift(row_index, 1)
+        self.__index_extend(row_index, [row])
+        self.__storage.insert(row_index, row)
 
-    def select(self, column_titles: list = None, **kwargs) -> typing.Tuple[int, dict]:
+    @writing
+    def insert_many(self, rows: typing.Iterable[dict]) -> int:
         """
-        Select all rows and able to filter them
+        Insert many rows at the end of the table, item types are validated once per batch
         :exception error.TableCreationError
+        :exception error.TableTitleError
+        :exception error.RowItemError
         """
 
         self.__table_creation_validator()
+        batch = []
 
-        if not column_titles:
-            column_titles = self.__columns
+        for kwargs in rows:
+            try:
+                batch.append([kwargs[title] for title in self.__columns])
+            except KeyError as err:
+                raise error.TableTitleError(f"Please define {err.args[0]} value")
 
-        for row_index, row in enumerate(self.__rows):
-            row = {
-                title: row[i] for i, title in enumerate(self.__columns) if title in column_titles
-            }
+        self.__extend(batch)
 
-            if kwargs and any(row[title] != item for title, item in kwargs.items()):
-                continue
+        return len(batch)
+
+    def select(
+            self, column_titles: list = None, where: Predicate = None, order_by: typing.Union[str, list] = None,
+            reverse: bool = False, limit: int = None, offset: int = 0, **kwargs
+    ) -> typing.Tuple[int, dict]:
+        """
+        Select all rows and able to filter, order and paginate them,
+        EX: where=(Col('age') >= 18) & Col('username').startswith('a'), order_by='age', limit=10
+        :exception error.TableCreationError
+        :exception error.TitleUndefinedError
+        :exception error.QueryError
+        """
+
+        self.__table_creation_validator()
+        titles, rows = self.__select(column_titles, kwargs, where, order_by, reverse, limit, offset)
+
+        for row_index, items in rows:
+            yield row_index, dict(zip(titles, items))
+
+    def select_rows(
+            self, column_titles: list = None, where: Predicate = None, order_by: typing.Union[str, list] = None,
+            reverse: bool = False, limit: int = None, offset: int = 0, **kwargs
+    ) -> typing.Tuple[int, Row]:
+        """
+        Select all rows as lightweight tuples and able to filter them, row.as_dict() gets a dict view
+        :exception error.TableCreationError
+        :exception error.TitleUndefinedError
+        :exception error.QueryError
+        """
 
-            yield row_index, row
+        self.__table_creation_validator()
+        titles, rows = self.__select(column_titles, kwargs, where, order_by, reverse, limit, offset)
+        row_type = row_factory(titles)
+
+        for row_index, items in rows:
+            yield row_index, row_type(items)
+
+    def select_values(
+            self, title: str, where: Predicate = None, order_by: typing.Union[str, list] = None,
+            reverse: bool = False, limit: int = None, offset: int = 0, **kwargs
+    ) -> typing.Tuple[int, typing.Any]:
+        """
+        Select all items of a column and able to filter them
+        :exception error.TableCreationError
+        :exception error.TitleUndefinedError
+        :exception error.QueryError
+        """
+
+        self.__table_creation_validator()
+        column_index = self.__column_index(title)
+
+        if not kwargs and where is None and order_by is None and limit is None and not offset:
+            if self.isThreadSafe:
+                # Copy the column under the read lock, like __select the caller iterates a snapshot
+                with self.lock.read():
+                    values = list(self.__storage.column(column_index))
+            else:
+                values = self.__storage.column(column_index)
+
+            yield from enumerate(values)
+            return
+
+        _, rows = self.__select([title], kwargs, where, order_by, reverse, limit, offset)
 
+        for row_index, items in rows:
+            yield row_index, items[0]
+
+    @writing
     def edit(self, row_index: int, **kwargs):
         """
         Edit a row already inserted
@@ -84,6 +218,7 @@ class DatabaseEngine(object):
 
         self.__table_creation_validator()
         self.__row_index_validator(row_index)
+        row_index %= len(self.__storage)
         row = []
 
         for column_index, title in enumerate(self.__columns):
@@ -93,11 +228,15 @@ class DatabaseEngine(object):
                 self.__item_type_validator(column_index, item)
 
             except KeyError:
-                row.append(self.__rows[row_index][column_index])
+                row.append(self.__storage.item(row_index, column_index))
                 continue
 
-        self.__rows[row_index] = row
+        self.__log('replace', row_index, row)
+        self.__index_discard(row_index, self.__storage.row(row_index))
+        self.__storage.replace(row_index, row)
+        self.__index_extend(row_index, [row])
 
+    @writing
     def remove_column(self, title: str):
         """
         Remove a column already defined
@@ -112,11 +251,14 @@ class DatabaseEngine(object):
         except ValueError:
             raise error.TitleUndefinedError(f"Title {title} is not defined")
 
+        self.__log('delete_column', column_index)
+        self.__indexes.pop(title, None)
+        self.__index_resolve()
         del self.__columns[column_index]
 
-        for row in self.__rows:
-            del row[column_index]
+        self.__storage.delete_column(column_index)
 
+    @writing
     def remove_row(self, row_index: int):
         """
         Remove a row already inserted
@@ -126,49 +268,234 @@ class DatabaseEngine(object):
 
         self.__table_creation_validator()
         self.__row_index_validator(row_index)
+        row_index %= len(self.__storage)
 
-        del self.__rows[row_index]
+        self.__log('delete', row_index)
+        self.__index_discard(row_index, self.__storage.row(row_index))
+        self.__index_shift(row_index + 1, -1)
+        self.__storage.delete(row_index)
 
+    @writing
     def clear(self):
         """Clear all rows"""
 
-        self.__rows.clear()
+        self.__log('clear')
+        self.__storage.clear()
+
+        for index in self.__indexes.values():
+            index.clear()
+
+    @writing
+    def create_index(self, title: str, ordered: bool = False):
+        """
+        Create an index on a column to speed up select filters,
+        a hash index serves equality only, an ordered index serves ranges, prefixes and order_by too
+        :exception error.TableCreationError
+        :exception error.TitleUndefinedError
+        :exception error.IndexCreationError
+        """
+
+        self.__table_creation_validator()
+
+        if title not in self.__columns:
+            raise error.TitleUndefinedError(f"Title {title} is not defined")
+        elif title in self.__indexes:
+            raise error.IndexCreationError(f"{title} index is already created")
+
+        if ordered:
+            index = SortedIndex(title)
+        else:
+            index = HashIndex(title)
+
+        try:
+            index.build(self.__column_values(title))
+        except TypeError:
+            kind = 'orderable' if ordered else 'hashable'
+            raise error.IndexCreationError(f"{title} values are not {kind}")
+
+        self.__log('create_index', title, ordered)
+        self.__indexes[title] = index
+
+    @writing
+    def remove_index(self, title: str) -> bool:
+        """Remove an index already created"""
+
+        if title not in self.__indexes:
+            return False
+
+        self.__log('remove_index', title)
+        del self.__indexes[title]
+
+        return True
+
+    @reading
+    def indexes(self) -> list:
+        """Get titles of all indexed columns"""
+
+        return list(self.__indexes)
+
+    @reading
+    def min_value(self, title: str) -> typing.Any:
+        """
+        Get the lowest item of a column or None if there are no rows
+        :exception error.TableCreationError
+        :exception error.TitleUndefinedError
+        """
+
+        return self.__extreme_value(title, min)
+
+    @reading
+    def max_value(self, title: str) -> typing.Any:
+        """
+        Get the highest item of a column or None if there are no rows
+        :exception error.TableCreationError
+        :exception error.TitleUndefinedError
+        """
+
+        return self.__extreme_value(title, max)
 
+    @reading
     def count_column(self) -> int:
         """Get count of columns"""
 
         return len(self.__columns)
 
+    @reading
     def count_row(self) -> int:
         """Get count of rows"""
 
-        return len(self.__rows)
+        return len(self.__storage)
+
+    def clear_key_cache(self):
+        """Forget all keys derived from passwords, data written next is encrypted with a new salt"""
+
+        self.__ciphers.clear()
+
+    def cache_info(self) -> dict:
+        """Get hits, misses, count and estimated memory in bytes of the cached pages of a paged engine and the budget"""
+
+        return self.__pages.info()
+
+    def clear_page_cache(self):
+        """Drop the decrypted pages of a paged engine and reset the counters"""
+
+        self.__pages.clear()
+
+    @writing
+    def table(self, name: str) -> 'DatabaseEngine':
+        """
+        Get the engine of a named table, it's loaded from its own file on the first access,
+        create_table() is needed if it's not saved before, each table is saved by its own dump()
+        :exception error.TableNameError
+        :exception error.SignatureNotFoundError
+        :exception error.WrongKeyError
+        :exception aescrypto.error.SignatureNotFoundError
+        :exception aescrypto.error.WrongKeyError
+        :exception EOFError
+        """
+
+        table = self.__tables.get(name)
+        if table is not None:
+            return table
+
+        table = DatabaseEngine(
+            self.__drive.table(name), self.__password, self.isColumnar, self.isJournaled, self.isDeduplicated,
+            self.isPaged, thread_safe=self.isThreadSafe
+        )
 
-    def import_attachment(self, name: str, path: str, ignore_file_exists: bool = False) -> str:
+        # Tables share the derived keys and the page cache budget of the engine
+        table.__ciphers = self.__ciphers
+        table.__pages = self.__pages
+        if table.__journal is not None:
+            table.__journal = Journal(table.__drive.journalPath, self.__password, self.__ciphers)
+
+        table.load()
+
+        return self.__tables.setdefault(name, table)
+
+    @reading
+    def tables(self) -> list:
+        """Get names of the tables saved on the drive and the tables opened by the engine"""
+
+        names = set(self.__tables)
+
+        if os.path.isdir(self.__drive.tableDir):
+            for file_name in os.listdir(self.__drive.tableDir):
+                name = file_name.split('.', 1)[0]
+
+                try:
+                    path = self.__database_path(self.__drive.table(name))
+                except error.TableNameError:
+                    continue
+
+                if os.path.basename(path) == file_name:
+                    names.add(name)
+
+        return sorted(names)
+
+    @writing
+    def remove_table(self, name: str) -> bool:
+        """
+        Remove a named table and its files, get False if it doesn't exist
+        :exception error.TableNameError
+        :exception PermissionError
+        """
+
+        drive = self.__drive.table(name)
+        table = self.__tables.pop(name, None)
+
+        if table is not None and isinstance(table.__storage, PagedStorage) and table.__storage.pageFile is not None:
+            table.__storage.pageFile.close()
+
+        result = table is not None
+        file_lock = table.fileLock if table is not None else FileLock(drive.lockPath)
+
+        # Other processes don't dump or load the table meanwhile
+        if os.path.isdir(drive.databaseDir):
+            with file_lock.exclusive():
+                for path in (self.__database_path(drive), drive.journalPath):
+                    if os.path.exists(path):
+                        os.remove(path)
+                        result = True
+
+        return result
+
+    def import_attachment(self, name: str, path: str, ignore_file_exists: bool = False, row_index: int = None) -> str:
         """
-        Import a file from drive to database attachments
+        Import a file from drive to database attachments, row_index links it to a row in the catalog
         :exception error.AttachmentStatusError
         :exception FileNotFoundError
         :exception FileExistsError
         """
 
         self.__attachment_validator()
-        directory = os.path.join(self.__drive.attachmentDir, name)
-        os.makedirs(directory, exist_ok=True)
+        cipher = self.__ciphers.get(self.__password) if self.__password else None
 
-        if self.__password:
-            cipher = aescrypto.AESCrypto(self.__password)
-            _, output_path = cipher.encrypt_file(
-                path, directory=directory, ignore_file_exists=ignore_file_exists
-            )
-        else:
-            output_path = os.path.join(directory, os.path.basename(path))
-            if not ignore_file_exists and os.path.exists(output_path):
-                raise FileExistsError("File already exists")
+        return self.__import_attachment(name, path, ignore_file_exists, cipher, row_index)
+
+    def import_attachments(
+            self, items: typing.Iterable[typing.Tuple[str, str]], workers: int = None, ignore_file_exists: bool = False
+    ) -> typing.List[tuple]:
+        """
+        Import many files from drive to database attachments in parallel, items are (name, path) pairs,
+        files share one cipher key, get (name, path, output_path, error) of each item ordered as items
+        :exception error.AttachmentStatusError
+        """
 
-            shutil.copy2(path, directory)
+        self.__attachment_validator()
+        self.__attachment_catalog()
+        cipher = self.__ciphers.get(self.__password) if self.__password else None
 
-        return output_path
+        def task(name: str, path: str) -> tuple:
+            try:
+                return name, path, self.__import_attachment(name, path, ignore_file_exists, cipher, None), None
+            except (OSError, EOFError, error.CompressionMethodError) as err:
+                return name, path, None, err
+
+        with concurrent.futures.ThreadPoolExecutor(workers or os.cpu_count()) as executor:
+            futures = [executor.submit(task, name, path) for name, path in items]
+
+        return [future.result() for future in futures]
 
     def export_attachment(
             self, name: str, file_name: str, output_dir: str = None, ignore_file_exists: bool = False
@@ -183,27 +510,73 @@ class DatabaseEngine(object):
         """
 
         self.__attachment_validator()
-        directory = os.path.join(self.__drive.attachmentDir, name)
-        path = os.path.join(directory, file_name)
+        path = self.__stored_path(name, file_name)
 
         if not output_dir:
             output_dir = self.__drive.tempDir
 
-        if self.__password:
-            path = aescrypto.utility.add_extension(path)
-            cipher = aescrypto.AESCrypto(self.__password)
-            _, output_path = cipher.decrypt_file(
-                path, directory=output_dir, ignore_file_exists=ignore_file_exists
-            )
-        else:
-            output_path = os.path.join(output_dir, file_name)
-            if not ignore_file_exists and os.path.exists(os.path.join(output_dir, os.path.basename(path))):
-                raise FileExistsError("File already exists")
+        output_path = self.__export_attachment(path, file_name, output_dir, ignore_file_exists)
 
-            shutil.copy2(path, output_dir)
+        if not self.__password:
+            shutil.copystat(path, output_path)
 
         return output_path
 
+    def export_attachments(
+            self, selection: typing.Iterable[typing.Tuple[str, str]], output_dir: str = None, workers: int = None
+    ) -> typing.Iterator[tuple]:
+        """
+        Export many files from database attachments to drive ( by default = temp ) in parallel,
+        selection is (name, file_name) pairs, files exported before and unchanged since are skipped,
+        a file name already exported by the selection gets FileExistsError,
+        get (name, file_name, output_path, error) of each file as soon as it's finished
+        :exception error.AttachmentStatusError
+        """
+
+        self.__attachment_validator()
+
+        if not output_dir:
+            output_dir = self.__drive.tempDir
+
+        os.makedirs(output_dir, exist_ok=True)
+
+        return self.__export_attachments(selection, output_dir, workers or os.cpu_count())
+
+    def open_attachment(self, name: str, file_name: str) -> typing.BinaryIO:
+        """
+        Open a file of database attachments to read without exporting it,
+        it's decrypted and decompressed lazily chunk by chunk and seekable, close it after use
+        :exception error.AttachmentStatusError
+        :exception error.SignatureNotFoundError
+        :exception error.WrongKeyError
+        :exception aescrypto.error.SignatureNotFoundError
+        :exception aescrypto.error.WrongKeyError
+        :exception FileNotFoundError
+        """
+
+        self.__attachment_validator()
+
+        return self.__open_stored(self.__stored_path(name, file_name))
+
+    def write_attachment(
+            self, name: str, file_name: str, stream: typing.Union[typing.BinaryIO, bytes],
+            ignore_file_exists: bool = False, row_index: int = None
+    ) -> str:
+        """
+        Write a file into database attachments from a binary stream or bytes, the stream is read chunk by chunk,
+        row_index links it to a row in the catalog
+        :exception error.AttachmentStatusError
+        :exception FileExistsError
+        """
+
+        self.__attachment_validator()
+        cipher = self.__ciphers.get(self.__password) if self.__password else None
+
+        if isinstance(stream, (bytes, bytearray, memoryview)):
+            stream = io.BytesIO(stream)
+
+        return self.__write_attachment(name, file_name, stream, ignore_file_exists, cipher, row_index)
+
     def select_attachments(self, name: str = None, file_name: str = None) -> str:
         """
         Select all attachments and able to filter them
@@ -212,15 +585,56 @@ class DatabaseEngine(object):
 
         self.__attachment_validator()
 
-        for root, _, files in os.walk(self.__drive.attachmentDir):
-            if name and name != os.path.basename(root):
+        for (entry_name, entry_file_name), entry in self.__attachment_catalog().items(name):
+            path = self.__attachment_path(entry_name, entry_file_name)
+
+            if file_name and file_name != os.path.basename(path):
                 continue
 
-            for file in files:
-                if file_name and file_name != file:
-                    continue
+            yield self.__entry_path(entry_name, entry_file_name, entry)
+
+    def attachment_info(self, name: str, file_name: str) -> typing.Optional[dict]:
+        """
+        Get the catalog entry of an attachment: size, mtime, hash ( sha256 ) and row, None for unknown values
+        :exception error.AttachmentStatusError
+        """
+
+        self.__attachment_validator()
+        entry = self.__attachment_catalog().get(name, file_name)
+
+        return self.__entry_info(entry) if entry is not None else None
+
+    def rebuild_attachment_catalog(self) -> int:
+        """
+        Rebuild the attachment catalog from the attachment files, get count of attachments,
+        sizes of encrypted files and hashes are unknown until the files are imported again
+        :exception error.AttachmentStatusError
+        """
+
+        self.__attachment_validator()
+
+        if self.__catalog is None:
+            self.__catalog = AttachmentCatalog(self.__drive.catalogPath, self.__password, self.__ciphers)
+
+            try:
+                self.__catalog.load()
+            except (error.SignatureNotFoundError, error.WrongKeyError):
+                # Rebuild from the attachment files only
+                pass
+
+        # Other processes don't change attachments until the catalog is rewritten
+        with self.__catalog.fileLock.exclusive():
+            entries = self.__scan_attachments()
 
-                yield os.path.join(root, file)
+            # Blobs are named by the catalog only, entries of blobs still on the drive are kept
+            for key, entry in self.__catalog.items():
+                if entry.get('blob') is not None and os.path.exists(self.__blob_path(entry['blob'])):
+                    entries.setdefault(key, entry)
+
+            self.__catalog.reset(entries)
+            self.__remove_orphan_blobs()
+
+        return len(entries)
 
     def remove_attachment(self, name: str, file_name: str) -> bool:
         """
@@ -229,22 +643,33 @@ class DatabaseEngine(object):
         """
 
         self.__attachment_validator()
-        directory = os.path.join(self.__drive.attachmentDir, name)
-        path = os.path.join(directory, file_name)
-        valid = False
+        catalog = self.__attachment_catalog()
 
-        if self.__password:
-            path = aescrypto.utility.add_extension(path)
+        # Other processes don't write or reference the attachment until its file and entry are removed
+        with catalog.fileLock.exclusive():
+            entry = catalog.get(name, file_name)
 
-        try:
-            os.remove(path)
-            valid = True
-            os.rmdir(directory)
-        except (OSError, FileNotFoundError):
-            # Ignore if the directory contains other files & file not exists
-            pass
+            if entry is not None and entry.get('blob') is not None:
+                # The blob is removed with its last reference
+                catalog.remove(name, file_name)
+                self.__remove_orphan_blobs()
+                return True
+
+            directory = os.path.join(self.__drive.attachmentDir, name)
+            path = self.__attachment_path(name, file_name)
+            valid = False
 
-        return valid
+            try:
+                os.remove(path)
+                valid = True
+                os.rmdir(directory)
+            except (OSError, FileNotFoundError):
+                # Ignore if the directory contains other files & file not exists
+                pass
+
+            catalog.remove(name, file_name)
+
+            return valid
 
     def exists_attachment(self, name: str, file_name: str) -> bool:
         """
@@ -253,96 +678,78 @@ class DatabaseEngine(object):
         """
 
         self.__attachment_validator()
-        directory = os.path.join(self.__drive.attachmentDir, name)
-        path = os.path.join(directory, file_name)
-
-        if self.__password:
-            path = aescrypto.utility.add_extension(path)
 
-        return os.path.exists(path)
+        return (name, file_name) in self.__attachment_catalog()
 
+    @writing
     def load_backup(
-            self, path: str, row_indexes: list = None, attachment_names: list = None, password: str = None
+            self, path: str, row_indexes: list = None, attachment_names: list = None, password: str = None,
+            primary_key: str = None, merge: str = 'skip'
     ):
         """
         Load all data from a backup file into database
+        Rows are matched by primary_key column or by the whole row if it's not set,
+        merge policy for matched rows: 'skip', 'overwrite' ( by primary_key only ) or 'keep' ( both )
         :exception error.TableCreationError
+        :exception error.TitleUndefinedError
+        :exception error.MergePolicyError
         :exception error.SignatureNotFoundError
+        :exception error.WrongKeyError
         :exception error.BackupStatusError
         :exception aescrypto.error.SignatureNotFoundError
         :exception aescrypto.error.WrongKeyError
         :exception FileNotFoundError
+        :exception EOFError
         """
 
         self.__table_creation_validator()
         self.__backup_validator()
+        self.__merge_validator(primary_key, merge)
+
+        if isinstance(row_indexes, list):
+            row_indexes = set(row_indexes)
 
         if not password:
             password = self.__password
 
-        if password:
-            cipher = aescrypto.AESCrypto(password)
-            _, path = cipher.decrypt_file(path, directory=self.__drive.tempDir, ignore_file_exists=True)
-
-        with open(path, 'rb') as src_file:
-            # Read signature
-            signature = src_file.read(len(self.__drive.backupSignature))
-            if signature != self.__drive.backupSignature:
-                raise error.SignatureNotFoundError("Signature not found")
-
-            # Read rows
-            size = struct.unpack('<Q', src_file.read(struct.calcsize('Q')))[0]
-            data = src_file.read(size)
-            rows = pickle.loads(data)
-
-            for index, row in enumerate(rows):
-                if (row in self.__rows) or (isinstance(row_indexes, list) and index not in row_indexes):
-                    continue
-
-                self.insert(**{
-                    title: row[i] for i, title in enumerate(self.__columns)
-                })
+        def reader(src_file: typing.BinaryIO):
+            self.__read_backup(src_file, row_indexes, attachment_names, primary_key, merge)
 
-            # Read attachment info
-            size = struct.unpack('<Q', src_file.read(struct.calcsize('Q')))[0]
-            data = src_file.read(size)
-            attachments_info = pickle.loads(data)
+        self.__open_backup(path, password, reader)
 
-            # Read attachment files
-            for file_path, size in attachments_info.items():
-                name = os.path.dirname(file_path)
-                directory = os.path.join(self.__drive.attachmentDir, name)
-                file_path = os.path.join(self.__drive.attachmentDir, file_path)
-                exists = os.path.exists(file_path)
+    def list_backup_contents(self, path: str, password: str = None) -> dict:
+        """
+        Get the row count and attachment file sizes of a backup file without loading it
+        :exception error.BackupStatusError
+        :exception error.SignatureNotFoundError
+        :exception error.WrongKeyError
+        :exception aescrypto.error.SignatureNotFoundError
+        :exception aescrypto.error.WrongKeyError
+        :exception FileNotFoundError
+        """
 
-                def __reader(file_size: int) -> typing.AnyStr:
-                    while True:
-                        chunk_size = min(chunkSize, file_size)
-                        if chunk_size == 0:
-                            break
+        self.__backup_validator()
 
-                        file_size -= chunk_size
-                        yield src_file.read(chunk_size)
+        if not password:
+            password = self.__password
 
-                if isinstance(attachment_names, list) and name not in attachment_names or (
-                        exists and os.path.getsize(file_path) == size
-                ):
-                    for _ in __reader(size):
-                        continue
-                    continue
-                elif exists:
-                    file_name = '%s %s' % (time.ctime().replace(':', '-'), os.path.basename(file_path))
-                    file_path = os.path.join(directory, file_name)
+        def reader(src_file: typing.BinaryIO) -> dict:
+            contents = self.__backup_contents(src_file)
+            offset, count = contents['rows']
 
-                os.makedirs(directory, exist_ok=True)
+            if count is None:
+                # Version 1 has no row count
+                src_file.seek(offset)
+                count = len(pickle.load(src_file))
 
-                with open(file_path, 'wb') as output_file:
-                    for chunk in __reader(size):
-                        output_file.write(chunk)
+            return {
+                'rows': count,
+                'attachments': {file_path: size for file_path, (_, size) in contents['attachments'].items()}
+            }
 
-        if password:
-            os.remove(path)
+        return self.__open_backup(path, password, reader)
 
+    @reading
     def dump_backup(
             self, row_indexes: list = None, attachment_names: list = None,
             output_dir: str = None, password: str = None
@@ -357,51 +764,22 @@ class DatabaseEngine(object):
         self.__backup_validator()
 
         # Rows collection
-        rows = self.__rows
         if isinstance(row_indexes, list):
-            rows = [self.__rows[i] for i in row_indexes]
+            rows = [self.__storage.row(i) for i in row_indexes]
+        else:
+            rows = list(self.__storage.rows())
 
         # Attachments collection
-        attachments_info = {}
+        attachment_entries = {}
+        attachment_sources = {}
         if self.__drive.isAttachment:
-            for name in os.listdir(self.__drive.attachmentDir):
+            for (name, file_name), entry in self.__attachment_catalog().items():
                 if isinstance(attachment_names, list) and name not in attachment_names:
                     continue
 
-                directory = os.path.join(self.__drive.attachmentDir, name)
-                for file_name in os.listdir(directory):
-                    size = os.path.getsize(os.path.join(directory, file_name))
-                    attachments_info.update({os.path.join(name, file_name): size})
-
-        file_name = '%s %s' % (time.ctime().replace(':', '-'), os.path.basename(self.__drive.backupPath))
-        path = os.path.join(self.__drive.tempDir, file_name)
-
-        with open(path, 'wb') as output_file:
-            # Write signature
-            output_file.write(self.__drive.backupSignature)
-
-            # Write rows
-            data = pickle.dumps(rows)
-            size = len(data)
-            output_file.write(struct.pack('<Q', size))
-            output_file.write(data)
-
-            # Write attachment info
-            data = pickle.dumps(attachments_info)
-            size = len(data)
-            output_file.write(struct.pack('<Q', size))
-            output_file.write(data)
-
-            # Write attachment files
-            for file_path in attachments_info:
-                with open(os.path.join(self.__drive.attachmentDir, file_path), 'rb') as src_file:
-                    while True:
-                        chunk = src_file.read(chunkSize)
-                        chunk_size = len(chunk)
-                        if chunk_size == 0:
-                            break
-
-                        output_file.write(chunk)
+                file_path = os.path.relpath(self.__attachment_path(name, file_name), self.__drive.attachmentDir)
+                attachment_entries[file_path] = (file_name, self.__entry_info(entry))
+                attachment_sources[file_path] = self.__entry_path(name, file_name, entry)
 
         if not output_dir:
             output_dir = self.__drive.backupDir
@@ -409,59 +787,137 @@ class DatabaseEngine(object):
         if not password:
             password = self.__password
 
-        if password:
-            cipher = aescrypto.AESCrypto(password)
-            _, output_path = cipher.encrypt_file(path, directory=output_dir)
+        # Backups dumped in the same second by other processes get numbered names
+        output_path, part_path = self.__reserve_backup_path(output_dir, password)
 
-        else:
-            output_path = os.path.join(output_dir, file_name)
-            shutil.copy2(path, output_dir)
+        # Encrypt on the fly into the reserved part file, the backup name appears once it's complete
+        try:
+            with open(part_path, 'wb') as output_file:
+                writer = CipherWriter(output_file, self.__ciphers.get(password)) if password else output_file
+
+                # Write signature, a zero size marks the versioned format
+                header = self.__drive.backupSignature + struct.pack('<QB', 0, backupVersion)
+                writer.write(header)
+                offset = len(header)
+
+                # Write rows, compressed with its own header
+                data = pickle.dumps(rows)
+                if self.__drive.compression is not None:
+                    data = compress(data, self.__drive.compression, self.__drive.compressionLevel)
+
+                writer.write(data)
+                contents = {'rows': (offset, len(rows)), 'attachments': {}, 'catalog': attachment_entries}
+                offset += len(data)
+                del data
+
+                # Write attachment files, a blob referenced by many attachments is written once
+                written = {}
+                for file_path, source_path in attachment_sources.items():
+                    if source_path in written:
+                        contents['attachments'][file_path] = written[source_path]
+                        continue
+
+                    size = 0
+
+                    with open(source_path, 'rb') as src_file:
+                        while True:
+                            chunk = src_file.read(chunkSize)
+                            chunk_size = len(chunk)
+                            if chunk_size == 0:
+                                break
 
-        os.remove(path)
+                            writer.write(chunk)
+                            size += chunk_size
+
+                    contents['attachments'][file_path] = written[source_path] = (offset, size)
+                    offset += size
+
+                # Write contents index of entry offsets, its offset ends the backup
+                writer.write(pickle.dumps(contents))
+                writer.write(struct.pack('<Q', offset))
+
+                if password:
+                    writer.close()
+
+            os.replace(part_path, output_path)
+
+        except BaseException:
+            # Release the reserved name
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
 
         return output_path
 
+    @writing
     def load(self) -> bool:
         """
-        Load all data into memory
+        Load all data into memory, a journaled engine replays the changes made after the snapshot,
+        a paged file reads its directory only and makes the engine paged
         :exception error.TableCreationError
         :exception error.SignatureNotFoundError
+        :exception error.WrongKeyError
         :exception aescrypto.error.SignatureNotFoundError
         :exception aescrypto.error.WrongKeyError
+        :exception EOFError
         """
 
         if not self.__drive.isCreated:
             self.__drive.create()
 
-        try:
-            if self.__password:
-                path = aescrypto.utility.add_extension(self.__drive.databasePath)
-                cipher = aescrypto.AESCrypto(self.__password)
-                _, data = cipher.load(path)
+        # Writers of other processes wait until the snapshot and its journal are read
+        with self.fileLock.shared():
+            path = self.__database_path()
+            try:
+                file = open(path, 'rb')
+            except FileNotFoundError:
+                self.__identity = None
+                return False
 
-            else:
-                with open(self.__drive.databasePath, 'rb') as file:
-                    data = file.read()
+            with file:
+                self.__identity = self.__file_identity(file)
 
-        except FileNotFoundError:
-            return False
+                if PageFile.is_paged(file, self.__drive.databaseSignature):
+                    # Rows stay in the file, pages are decrypted on demand
+                    page_file = PageFile(
+                        path, self.__drive.databaseSignature, self.__password, self.__ciphers, self.__pages
+                    )
+                    info = {
+                        'columns': page_file.columns,
+                        'indexes': {title: ordered for title, (ordered, _, _) in page_file.indexes.items()},
+                    }
 
-        signature_length = len(self.__drive.databaseSignature)
-        signature = data[:signature_length]
-        if signature != self.__drive.databaseSignature:
-            raise error.SignatureNotFoundError("Signature not found")
+                    self.isPaged = True
+                    self.create_table(info['columns'])
+                    self.__storage = PagedStorage(len(self.__columns), page_file)
+                    generation = page_file.generation
 
-        data = data[signature_length:]
-        data = pickle.loads(data)
+                else:
+                    info, generation = self.__load_snapshot(file, path)
 
-        self.create_table(data.pop(-1))
-        self.__rows = data
+            self.__generation = generation
 
-        return True
+            for title, ordered in info['indexes'].items():
+                self.__indexes.setdefault(title, SortedIndex(title) if ordered else HashIndex(title))
 
-    def dump(self):
+            if self.__journal is not None:
+                for record in self.__journal.read():
+                    if self.__journal.generation != self.__generation:
+                        # The journal belongs to another snapshot
+                        break
+
+                    self.__replay(record)
+
+            self.__pending.clear()
+            self.__index_invalidate()
+
+            return True
+
+    @writing
+    def dump(self):
         """
-        Dump all data to save on the drive
+        Dump all data to save on the drive, a journaled engine appends the changes only
+        until the journal grows bigger than the snapshot, then it compacts
         :exception error.TableCreationError
         """
 
@@ -470,44 +926,1121 @@ class DatabaseEngine(object):
         if not self.__drive.isCreated:
             self.__drive.create()
 
-        data = self.__drive.databaseSignature
+        with self.fileLock.exclusive():
+            # Changes are appended only to the journal of this snapshot as it's read or written here,
+            # otherwise another process wrote in between and a full snapshot replaces its data
+            if self.__journal is not None and self.__generation is not None and (
+                    self.__journal.generation == self.__generation
+            ) and not self.changed():
+                size = self.__journal.size() + sum(map(len, self.__pending))
+
+                if size <= self.__database_size():
+                    self.__journal.append(self.__pending)
+                    self.__pending.clear()
+                    return
+
+            self.compact()
+
+    @writing
+    def compact(self):
+        """
+        Dump a full snapshot of all data and start an empty journal
+        :exception error.TableCreationError
+        """
+
+        self.__table_creation_validator()
+
+        if not self.__drive.isCreated:
+            self.__drive.create()
+
+        with self.fileLock.exclusive():
+            # Write a new file next to the database then replace it, a crash keeps the old one
+            path = self.__database_path()
+            temp_path = temp_file_path(path)
+
+            try:
+                with open(temp_path, 'wb') as file:
+                    generation = self.__write_pages(file) if self.isPaged else self.__write_snapshot(file)
+
+                    file.flush()
+                    os.fsync(file.fileno())
+
+                os.replace(temp_path, path)
+                self.__identity = self.__file_identity()
+
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+
+            if self.isPaged:
+                # Continue from the new file, changed pages are not kept in memory anymore
+                page_file = self.__storage.pageFile
+                self.__storage = PagedStorage(len(self.__columns), PageFile(
+                    path, self.__drive.databaseSignature, self.__password, self.__ciphers, self.__pages
+                ))
+
+                if page_file is not None:
+                    page_file.close()
+
+            self.__generation = generation
+            self.__pending.clear()
+
+            if self.__journal is not None:
+                self.__journal.reset(generation)
+
+    def changed(self) -> bool:
+        """Check the database file or its journal is changed by another engine or process since it's loaded or dumped"""
+
+        if self.__identity != self.__file_identity():
+            return True
+
+        # A journal of another snapshot is not read, its changes don't matter
+        return self.__journal is not None and self.__generation is not None and (
+            self.__journal.generation == self.__generation and self.__journal.changed()
+        )
+
+    @writing
+    def reload(self) -> bool:
+        """
+        Load again if the saved data is changed by another engine or process, get False if nothing is changed,
+        changes not dumped here are dropped, records appended to the journal are replayed without loading the snapshot
+        :exception error.TableCreationError
+        :exception error.SignatureNotFoundError
+        :exception error.WrongKeyError
+        :exception aescrypto.error.SignatureNotFoundError
+        :exception aescrypto.error.WrongKeyError
+        :exception EOFError
+        """
+
+        if not self.changed():
+            return False
+
+        with self.fileLock.shared():
+            if self.__identity is not None and self.__identity == self.__file_identity() and (
+                    not self.__pending and self.__journal.appended()
+            ):
+                for record in self.__journal.read(resume=True):
+                    self.__replay(record)
+
+                self.__index_invalidate()
+                return True
+
+            if isinstance(self.__storage, PagedStorage) and self.__storage.pageFile is not None:
+                self.__storage.pageFile.close()
+
+            self.__columns = []
+            self.__indexes = {}
+            self.__storage = self.__create_storage()
+            self.__generation = None
 
-        self.__rows.append(self.__columns)
-        data += pickle.dumps(self.__rows)
-        self.__rows.pop(-1)
+            self.load()
+
+        return True
+
+    def __write_snapshot(self, file: typing.BinaryIO) -> bytes:
+        info = {
+            'columns': self.__columns,
+            'indexes': {title: isinstance(index, SortedIndex) for title, index in self.__indexes.items()},
+        }
+
+        # Same content gets the same generation, a journal applies to any snapshot of it
+        digest = hashlib.sha256(pickle.dumps(self.__columns))
+
+        cipher_writer = CipherWriter(file, self.__ciphers.get(self.__password)) if self.__password else file
+        cipher_writer.write(self.__drive.databaseSignature + struct.pack('<B', databaseVersion))
+
+        # The body after the version byte is compressed with its own header
+        writer = self.__compress_writer(cipher_writer)
+        writer.write(pickle.dumps(info))
+
+        rows = self.__storage.rows()
+        for batch in iter(lambda: list(itertools.islice(rows, batchSize)), []):
+            data = pickle.dumps(batch)
+            digest.update(data)
+            writer.write(data)
+
+        generation = digest.digest()[:generationSize]
+        writer.write(pickle.dumps(None))
+        writer.write(pickle.dumps(generation))
+
+        if writer is not cipher_writer:
+            writer.close()
 
         if self.__password:
+            cipher_writer.close()
+
+        return generation
+
+    def __write_pages(self, file: typing.BinaryIO) -> bytes:
+        page_file = self.__storage.pageFile
+        cipher = None
+
+        if self.__password:
+            # Keep the key of the current file, its unchanged pages are copied without decrypting them
+            salt = page_file.salt if page_file is not None else None
+            cipher = self.__ciphers.get(self.__password, salt)
+
+        copy = page_file is not None and page_file.salt == (cipher.salt if cipher is not None else None)
+        writer = PageWriter(
+            file, self.__drive.databaseSignature, cipher, self.__drive.compression, self.__drive.compressionLevel,
+            page_file.nextId if page_file is not None else 0
+        )
+
+        for rows, number in self.__storage.pages():
+            if rows is not None:
+                writer.write_page(rows)
+            elif copy:
+                writer.copy_page(page_file, number)
+            else:
+                writer.write_page(page_file.page(number))
+
+        # Indexes are stored built, lookups after opening the file don't read all pages
+        for title in list(self.__indexes):
+            index = self.__index(title)
+            writer.write_index(title, isinstance(index, SortedIndex), index)
+
+        generation = os.urandom(generationSize)
+        writer.close(self.__columns, generation)
+
+        return generation
+
+    def __load_snapshot(self, file: typing.BinaryIO, path: str) -> typing.Tuple[dict, typing.Optional[bytes]]:
+        if not self.__password:
+            stream = file
+        elif CipherReader.is_stream(file):
+            # Decrypt one chunk at a time straight into the unpickler
+            stream = io.BufferedReader(CipherReader(file, self.__password, self.__ciphers), chunkSize)
+        else:
+            # Older databases are encrypted as a whole file
             cipher = aescrypto.AESCrypto(self.__password)
-            cipher.dump(data, path=self.__drive.databasePath, ignore_file_exists=True)
+            _, data = cipher.load(path)
+            stream = io.BufferedReader(io.BytesIO(data))
+            del data
+
+        signature = stream.read(len(self.__drive.databaseSignature))
+        if signature != self.__drive.databaseSignature:
+            raise error.SignatureNotFoundError("Signature not found")
+
+        version = stream.peek(1)[:1]
+
+        if version == pickle.PROTO:
+            # Version 1 has no version byte, columns are the last item of rows
+            rows = pickle.load(stream)
+            info = {'columns': rows.pop(-1), 'indexes': {}}
+            self.create_table(info['columns'])
+            self.__storage.extend(rows)
+            generation = None
+            del rows
+        elif version and version[0] in (2, databaseVersion):
+            stream.read(1)
+
+            # Version 3 body may be compressed
+            if version[0] == databaseVersion and DecompressReader.is_compressed(stream):
+                stream = io.BufferedReader(DecompressReader(stream, close_file=False), chunkSize)
+
+            info = pickle.load(stream)
+            self.create_table(info['columns'])
+
+            # Rows are stored in batches until a None batch, the generation follows them
+            for rows in iter(lambda: pickle.load(stream), None):
+                self.__storage.extend(rows)
+
+            generation = pickle.load(stream)
 
         else:
-            with open(self.__drive.databasePath, 'wb') as file:
-                file.write(data)
+            raise error.SignatureNotFoundError(f"Database version {version.hex()} is not supported")
+
+        return info, generation
+
+    def __import_attachment(
+            self, name: str, path: str, ignore_file_exists: bool, cipher: typing.Optional[Cipher],
+            row_index: typing.Optional[int]
+    ) -> str:
+        with open(path, 'rb') as src_file:
+            return self.__write_attachment(
+                name, os.path.basename(path), src_file, ignore_file_exists, cipher, row_index
+            )
+
+    def __write_attachment(
+            self, name: str, file_name: str, src_file: typing.BinaryIO, ignore_file_exists: bool,
+            cipher: typing.Optional[Cipher], row_index: typing.Optional[int]
+    ) -> str:
+        catalog = self.__attachment_catalog()
+        output_path = self.__attachment_path(name, file_name)
+
+        if not ignore_file_exists and ((name, file_name) in catalog or os.path.exists(output_path)):
+            raise FileExistsError("File already exists")
+
+        if self.isDeduplicated:
+            return self.__write_blob(name, file_name, src_file, cipher, row_index)
+
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        temp_path, digest, size = self.__write_temp_file(output_path, src_file, cipher)
+
+        try:
+            # The file and its entry appear at once, a removal by another process doesn't come in between
+            with catalog.fileLock.exclusive():
+                os.replace(temp_path, output_path)
+                catalog.add(name, file_name, {
+                    'size': size, 'mtime': os.path.getmtime(output_path), 'hash': digest, 'row': row_index
+                })
+                self.__remove_orphan_blobs()
+
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        return output_path
+
+    def __write_blob(
+            self, name: str, file_name: str, src_file: typing.BinaryIO, cipher: typing.Optional[Cipher],
+            row_index: typing.Optional[int]
+    ) -> str:
+        catalog = self.__attachment_catalog()
+        entry = {'size': 0, 'mtime': time.time(), 'hash': None, 'row': row_index}
+
+        if src_file.seekable():
+            # Hash first, a content stored before is referenced without encrypting it again
+            position = src_file.tell()
+            digest = hashlib.sha256()
+
+            for chunk in iter(lambda: src_file.read(chunkSize), b''):
+                digest.update(chunk)
+                entry['size'] += len(chunk)
+
+            entry['hash'] = digest.hexdigest()
+            blob = catalog.link(name, file_name, entry)
+
+            if blob is not None:
+                self.__remove_orphan_blobs()
+                return self.__blob_path(blob)
+
+            src_file.seek(position)
+
+        blob = os.urandom(16).hex()
+        output_path = self.__blob_path(blob)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        temp_path, entry['hash'], entry['size'] = self.__write_temp_file(output_path, src_file, cipher)
+        os.replace(temp_path, output_path)
+
+        # Another thread may have stored the same content meanwhile, its blob is referenced then
+        linked = catalog.link(name, file_name, entry, blob)
+        if linked != blob:
+            os.remove(output_path)
+
+        self.__remove_orphan_blobs()
+
+        return self.__blob_path(linked)
+
+    def __write_temp_file(
+            self, output_path: str, src_file: typing.BinaryIO, cipher: typing.Optional[Cipher]
+    ) -> typing.Tuple[str, str, int]:
+        # Write into a temp name the caller replaces the output with, other threads and processes
+        # may write into the same directory
+        temp_path = temp_file_path(output_path)
+        digest = hashlib.sha256()
+        size = 0
+
+        try:
+            with open(temp_path, 'wb') as output_file:
+                cipher_writer = CipherWriter(output_file, cipher) if cipher is not None else output_file
+                writer = self.__compress_writer(cipher_writer)
+
+                while True:
+                    chunk = src_file.read(chunkSize)
+                    if not chunk:
+                        break
+
+                    digest.update(chunk)
+                    size += len(chunk)
+                    writer.write(chunk)
+
+                if writer is not cipher_writer:
+                    writer.close()
+
+                if cipher is not None:
+                    cipher_writer.close()
+
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        return temp_path, digest.hexdigest(), size
+
+    def __attachment_catalog(self) -> AttachmentCatalog:
+        if self.__catalog is None:
+            catalog = AttachmentCatalog(self.__drive.catalogPath, self.__password, self.__ciphers)
+
+            # Attachments imported before the catalog existed are scanned once, by one process
+            with catalog.fileLock.exclusive():
+                if not catalog.load():
+                    catalog.reset(self.__scan_attachments())
+
+            self.__catalog = catalog
+
+        return self.__catalog
+
+    def __scan_attachments(self) -> dict:
+        entries = {}
+
+        if not os.path.isdir(self.__drive.attachmentDir):
+            return entries
+
+        for name in os.listdir(self.__drive.attachmentDir):
+            directory = os.path.join(self.__drive.attachmentDir, name)
+            if not os.path.isdir(directory):
+                continue
+
+            for disk_file_name in os.listdir(directory):
+                path = os.path.join(directory, disk_file_name)
+                entries[(name, self.__attachment_file_name(disk_file_name))] = {
+                    'size': None if self.__password else os.path.getsize(path),
+                    'mtime': os.path.getmtime(path),
+                    'hash': None,
+                    'row': None,
+                }
+
+        return entries
+
+    def __attachment_path(self, name: str, file_name: str) -> str:
+        path = os.path.join(self.__drive.attachmentDir, name, file_name)
+
+        if self.__password:
+            path = aescrypto.utility.add_extension(path)
+
+        return path
+
+    def __compress_writer(self, file: typing.BinaryIO) -> typing.BinaryIO:
+        if self.__drive.compression is None:
+            return file
+
+        return CompressWriter(file, self.__drive.compression, self.__drive.compressionLevel)
+
+    def __stored_path(self, name: str, file_name: str) -> str:
+        return self.__entry_path(name, file_name, self.__attachment_catalog().get(name, file_name))
+
+    def __entry_path(self, name: str, file_name: str, entry: typing.Optional[dict]) -> str:
+        # Path of an entry already read from the catalog, looking it up again stats the catalog file
+        if entry is not None and entry.get('blob') is not None:
+            return self.__blob_path(entry['blob'])
+
+        return self.__attachment_path(name, file_name)
+
+    def __blob_path(self, blob: str) -> str:
+        return os.path.join(self.__drive.blobDir, blob[:2], blob)
+
+    def __remove_orphan_blobs(self):
+        catalog = self.__attachment_catalog()
+
+        # Other processes can't reference a blob again until it's removed
+        with catalog.fileLock.exclusive():
+            for blob in catalog.orphans():
+                try:
+                    os.remove(self.__blob_path(blob))
+                except FileNotFoundError:
+                    pass
+
+    @staticmethod
+    def __entry_info(entry: dict) -> dict:
+        # Blob names are internal to the drive
+        return {key: value for key, value in entry.items() if key != 'blob'}
+
+    def __attachment_file_name(self, disk_file_name: str) -> str:
+        if self.__password:
+            return os.path.splitext(disk_file_name)[0]
+
+        return disk_file_name
+
+    def __open_stored(self, path: str) -> typing.BinaryIO:
+        file = open(path, 'rb')
+
+        try:
+            if self.__password and not CipherReader.is_stream(file):
+                file.close()
+
+                # Older attachments are encrypted as a whole file
+                cipher = aescrypto.AESCrypto(self.__password)
+                _, data = cipher.load(path)
+
+                return io.BytesIO(data)
+
+            elif self.__password:
+                file = io.BufferedReader(CipherReader(file, self.__password, self.__ciphers), chunkSize)
+
+            if DecompressReader.is_compressed(file):
+                file = io.BufferedReader(DecompressReader(file), chunkSize)
+
+        except BaseException:
+            file.close()
+            raise
+
+        return file
+
+    def __export_attachment(
+            self, path: str, file_name: str, output_dir: str, ignore_file_exists: bool, modified_time: int = None
+    ) -> str:
+        stream = True
+        if self.__password:
+            with open(path, 'rb') as src_file:
+                stream = CipherReader.is_stream(src_file)
+
+        output_path = os.path.join(output_dir, file_name)
+        if not ignore_file_exists and os.path.exists(output_path):
+            raise FileExistsError("File already exists")
+
+        # Write into a temp name then replace the output, a failed or concurrent export leaves no partial file
+        temp_path = temp_file_path(output_path)
+
+        try:
+            if stream:
+                with self.__open_stored(path) as src_file, open(temp_path, 'wb') as output_file:
+                    shutil.copyfileobj(src_file, output_file, chunkSize)
+
+                exported_path = temp_path
+            else:
+                # Older attachments are encrypted as a whole file, decrypted into a temp directory
+                os.mkdir(temp_path)
+                cipher = aescrypto.AESCrypto(self.__password)
+                _, exported_path = cipher.decrypt_file(path, directory=temp_path, ignore_file_exists=True)
+
+            if modified_time is not None:
+                os.utime(exported_path, ns=(time.time_ns(), modified_time))
+
+            os.replace(exported_path, output_path)
+
+        finally:
+            if os.path.isdir(temp_path):
+                shutil.rmtree(temp_path)
+            elif os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        return output_path
+
+    def __export_attachments(
+            self, selection: typing.Iterable[typing.Tuple[str, str]], output_dir: str, workers: int
+    ) -> typing.Iterator[tuple]:
+        def task(name: str, file_name: str) -> tuple:
+            try:
+                return name, file_name, self.__export_changed_attachment(name, file_name, output_dir), None
+            except (
+                    OSError, EOFError, error.SignatureNotFoundError, error.WrongKeyError, error.CompressionMethodError,
+                    aescrypto.error.SignatureNotFoundError, aescrypto.error.WrongKeyError
+            ) as err:
+                return name, file_name, None, err
+
+        with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+            futures = set()
+            output_paths = set()
+
+            for name, file_name in selection:
+                # Attachments of other names with the same file name would overwrite each other
+                output_path = os.path.normcase(os.path.abspath(os.path.join(output_dir, file_name)))
+                if output_path in output_paths:
+                    yield name, file_name, None, FileExistsError(f"Another attachment is exported to {file_name}")
+                    continue
+
+                output_paths.add(output_path)
+                futures.add(executor.submit(task, name, file_name))
+
+                # Keep a bounded number of files in flight for any selection size
+                if len(futures) >= workers * 2:
+                    done, futures = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+
+            for future in concurrent.futures.as_completed(futures):
+                yield future.result()
+
+    def __export_changed_attachment(self, name: str, file_name: str, output_dir: str) -> str:
+        path = self.__stored_path(name, file_name)
+        output_path = os.path.join(output_dir, file_name)
+        modified_time = os.stat(path).st_mtime_ns
+
+        # An exported file gets the attachment modified time, a different time means one of them changed
+        try:
+            if os.stat(output_path).st_mtime_ns == modified_time:
+                return output_path
+        except FileNotFoundError:
+            pass
+
+        return self.__export_attachment(path, file_name, output_dir, True, modified_time)
+
+    def __open_backup(self, path: str, password: typing.Optional[str], reader: typing.Callable) -> typing.Any:
+        with open(path, 'rb') as backup_file:
+            if not password:
+                return reader(backup_file)
+
+            elif CipherReader.is_stream(backup_file):
+                # Decrypt while parsing, a single read pass without a plaintext copy
+                return reader(io.BufferedReader(CipherReader(backup_file, password, self.__ciphers), chunkSize))
+
+        # Older backups are encrypted as a whole file
+        cipher = aescrypto.AESCrypto(password)
+        _, path = cipher.decrypt_file(path, directory=self.__drive.tempDir, ignore_file_exists=True)
+
+        try:
+            with open(path, 'rb') as src_file:
+                return reader(src_file)
+        finally:
+            os.remove(path)
+
+    def __backup_contents(self, src_file: typing.BinaryIO) -> dict:
+        # Read signature
+        signature = src_file.read(len(self.__drive.backupSignature))
+        if signature != self.__drive.backupSignature:
+            raise error.SignatureNotFoundError("Signature not found")
+
+        size = struct.unpack('<Q', src_file.read(struct.calcsize('<Q')))[0]
+
+        if size:
+            # Version 1 has no index, rows, attachment info and files follow each other
+            rows_offset = src_file.tell()
+            src_file.seek(rows_offset + size + struct.calcsize('<Q'))
+            attachments_info = pickle.load(src_file)
+
+            contents = {'rows': (rows_offset, None), 'attachments': {}}
+            offset = src_file.tell()
+
+            for file_path, size in attachments_info.items():
+                contents['attachments'][file_path] = (offset, size)
+                offset += size
+
+            return contents
+
+        version = src_file.read(1)
+        if version not in (struct.pack('<B', 2), struct.pack('<B', backupVersion)):
+            raise error.SignatureNotFoundError(f"Backup version {version.hex()} is not supported")
+
+        # Read contents index, its offset ends the backup
+        src_file.seek(-struct.calcsize('<Q'), os.SEEK_END)
+        src_file.seek(struct.unpack('<Q', src_file.read(struct.calcsize('<Q')))[0])
+
+        return pickle.load(src_file)
+
+    def __read_backup(
+            self, src_file: typing.BinaryIO, row_indexes: typing.Optional[set], attachment_names: typing.Optional[list],
+            primary_key: typing.Optional[str], merge: str
+    ):
+        contents = self.__backup_contents(src_file)
+
+        # Read rows, version 3 rows may be compressed
+        src_file.seek(contents['rows'][0])
+        if DecompressReader.is_compressed(src_file):
+            rows = pickle.load(io.BufferedReader(DecompressReader(src_file, close_file=False), chunkSize))
+        else:
+            rows = pickle.load(src_file)
+
+        column_count = len(self.__columns)
+
+        self.__merge([
+            row[:column_count] for index, row in enumerate(rows)
+            if row_indexes is None or index in row_indexes
+        ], primary_key, merge)
+
+        del rows
+
+        # Read attachment files, skipped files are not read at all
+        catalog = self.__attachment_catalog()
+
+        # Restored files and their entries appear at once for other processes
+        with catalog.fileLock.exclusive():
+            for file_path, (offset, size) in contents['attachments'].items():
+                name = os.path.dirname(file_path)
+                file_name, entry = contents.get('catalog', {}).get(file_path, (None, None))
+
+                if isinstance(attachment_names, list) and name not in attachment_names:
+                    continue
+
+                if self.isDeduplicated:
+                    self.__read_backup_blob(src_file, offset, size, name, file_path, file_name, entry)
+                    continue
+
+                directory = os.path.join(self.__drive.attachmentDir, name)
+                file_path = os.path.join(self.__drive.attachmentDir, file_path)
+                exists = os.path.exists(file_path)
+
+                if exists and os.path.getsize(file_path) == size:
+                    continue
+                elif exists:
+                    file_name = '%s %s' % (time.ctime().replace(':', '-'), os.path.basename(file_path))
+                    file_path = os.path.join(directory, file_name)
+
+                os.makedirs(directory, exist_ok=True)
+                self.__copy_backup_file(src_file, offset, size, file_path)
+
+                if entry is None:
+                    # Version 1 has no catalog
+                    entry = {'size': None, 'mtime': os.path.getmtime(file_path), 'hash': None, 'row': None}
+
+                catalog.add(name, self.__attachment_file_name(os.path.basename(file_path)), entry)
+
+            self.__remove_orphan_blobs()
+
+    def __read_backup_blob(
+            self, src_file: typing.BinaryIO, offset: int, size: int, name: str, file_path: str,
+            file_name: typing.Optional[str], entry: typing.Optional[dict]
+    ):
+        catalog = self.__attachment_catalog()
+
+        if entry is None:
+            # Version 1 has no catalog
+            file_name = self.__attachment_file_name(os.path.basename(file_path))
+            entry = {'size': None, 'mtime': time.time(), 'hash': None, 'row': None}
+
+        current = catalog.get(name, file_name)
+        if current is not None and entry['hash'] is not None and current['hash'] == entry['hash']:
+            return
+        elif current is not None:
+            file_name = '%s %s' % (time.ctime().replace(':', '-'), file_name)
+
+        # Content stored already is referenced, otherwise the backup file is copied into a new blob
+        if catalog.link(name, file_name, entry) is not None:
+            return
+
+        blob = os.urandom(16).hex()
+        output_path = self.__blob_path(blob)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        self.__copy_backup_file(src_file, offset, size, output_path)
+
+        catalog.link(name, file_name, entry, blob)
+
+    @staticmethod
+    def __copy_backup_file(src_file: typing.BinaryIO, offset: int, size: int, output_path: str):
+        src_file.seek(offset)
+
+        with open(output_path, 'wb') as output_file:
+            while size:
+                chunk = src_file.read(min(chunkSize, size))
+                if not chunk:
+                    raise EOFError("Backup is truncated")
+
+                output_file.write(chunk)
+                size -= len(chunk)
+
+    def __create_storage(self) -> typing.Union[RowStorage, ColumnStorage, PagedStorage]:
+        if self.isPaged:
+            return PagedStorage(len(self.__columns))
+        elif self.isColumnar:
+            return ColumnStorage(len(self.__columns))
+
+        return RowStorage(len(self.__columns))
+
+    def __reserve_backup_path(self, output_dir: str, password: typing.Optional[str]) -> typing.Tuple[str, str]:
+        # Create a part file next to a free name, the complete backup is renamed from it,
+        # readers never see an incomplete backup and a crash leaves only the part file
+        backup_name = os.path.basename(self.__drive.backupPath)
+        created_time = time.ctime().replace(':', '-')
+
+        for number in itertools.count(1):
+            file_name = '%s %s' % (created_time, backup_name)
+            if number > 1:
+                file_name = '%s (%s) %s' % (created_time, number, backup_name)
+
+            output_path = os.path.join(output_dir, file_name)
+            if password:
+                output_path = aescrypto.utility.add_extension(output_path)
+
+            part_path = '%s.part' % output_path
+            if os.path.exists(output_path):
+                continue
+
+            try:
+                os.close(os.open(part_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            except FileExistsError:
+                continue
+
+            # Another process may have renamed its part file to the name between the check and the reservation
+            if os.path.exists(output_path):
+                os.remove(part_path)
+                continue
+
+            return output_path, part_path
+
+    def __file_identity(self, file: typing.BinaryIO = None) -> typing.Optional[tuple]:
+        # Inode, size and modification time, a dump by any process changes one of them
+        try:
+            stat = os.fstat(file.fileno()) if file is not None else os.stat(self.__database_path())
+        except FileNotFoundError:
+            return None
+
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def __database_path(self, drive: DriveSetup = None) -> str:
+        drive = drive or self.__drive
+
+        if self.__password:
+            return aescrypto.utility.add_extension(drive.databasePath)
+
+        return drive.databasePath
+
+    def __database_size(self) -> int:
+        try:
+            return os.path.getsize(self.__database_path())
+        except FileNotFoundError:
+            return 0
+
+    def __log(self, operation: str, *args):
+        # Pickle now, rows may be changed in place before the next dump
+        if self.__journal is not None:
+            self.__pending.append(pickle.dumps((operation,) + args))
+
+    def __replay(self, record: tuple):
+        operation, *args = record
+
+        if operation == 'extend':
+            self.__storage.extend(*args)
+        elif operation == 'insert':
+            self.__storage.insert(*args)
+        elif operation == 'replace':
+            self.__storage.replace(*args)
+        elif operation == 'delete':
+            self.__storage.delete(*args)
+        elif operation == 'delete_column':
+            column_index, = args
+            self.__indexes.pop(self.__columns[column_index], None)
+            del self.__columns[column_index]
+            self.__storage.delete_column(column_index)
+        elif operation == 'clear':
+            self.__storage.clear()
+        elif operation == 'create_index':
+            title, ordered = args
+            self.__indexes.setdefault(title, SortedIndex(title) if ordered else HashIndex(title))
+        elif operation == 'remove_index':
+            title, = args
+            self.__indexes.pop(title, None)
+
+    def __column_index(self, title: str) -> int:
+        try:
+            return self.__columns.index(title)
+        except ValueError:
+            raise error.TitleUndefinedError(f"Title {title} is not defined")
+
+    def __select(
+            self, column_titles: typing.Optional[list], kwargs: dict, where: typing.Optional[Predicate] = None,
+            order_by: typing.Union[str, list, None] = None, reverse: bool = False,
+            limit: typing.Optional[int] = None, offset: int = 0
+    ) -> typing.Tuple[list, typing.Iterator]:
+        self.__query_validator(where, limit, offset)
+
+        if self.isThreadSafe:
+            # Collect the matches under the read lock, the caller iterates a snapshot while other threads write
+            with self.lock.read():
+                titles, rows = self.__query(column_titles, kwargs, where, order_by, reverse, limit, offset)
+                return titles, iter(list(rows))
+
+        return self.__query(column_titles, kwargs, where, order_by, reverse, limit, offset)
+
+    def __query(
+            self, column_titles: typing.Optional[list], kwargs: dict, where: typing.Optional[Predicate],
+            order_by: typing.Union[str, list, None], reverse: bool, limit: typing.Optional[int], offset: int
+    ) -> typing.Tuple[list, typing.Iterator]:
+        # Resolve column indexes once, only the projected items are read
+        if column_titles:
+            column_indexes = [i for i, title in enumerate(self.__columns) if title in column_titles]
+        else:
+            column_indexes = list(range(len(self.__columns)))
+
+        titles = [self.__columns[i] for i in column_indexes]
+        filters = [(self.__column_index(title), item) for title, item in kwargs.items()]
+
+        test = None
+        if where is not None:
+            test = where.compile(self.__column_getter)
+
+        row_indexes = self.__plan(kwargs, where)
+
+        if row_indexes is None and order_by is not None:
+            # Walk an ordered index instead of sorting, pagination stops early
+            index = self.__ordered_index(order_by)
+            if index is not None:
+                row_indexes = index.ordered(reverse)
+                order_by = None
+
+        rows = self.__storage.select(row_indexes, column_indexes, filters, test)
+
+        return titles, self.__paginate(rows, order_by, reverse, limit, offset)
+
+    def __plan(self, kwargs: dict, where: typing.Optional[Predicate]) -> typing.Optional[list]:
+        # Candidate row indexes from indexes, None for a full scan
+        candidates = None
+
+        for title, item in kwargs.items():
+            row_indexes = self.__index_lookup(title, '==', item)
+            if row_indexes is not None and (candidates is None or len(row_indexes) < len(candidates)):
+                candidates = row_indexes
+
+        if where is not None:
+            row_indexes = where.plan(self.__index_lookup)
+            if row_indexes is not None:
+                candidates = row_indexes if candidates is None else row_indexes.intersection(candidates)
+
+        if candidates is None:
+            return None
+
+        return sorted(candidates)
+
+    def __paginate(
+            self, rows: typing.Iterator, order_by: typing.Union[str, list, None], reverse: bool,
+            limit: typing.Optional[int], offset: int
+    ) -> typing.Iterator:
+        if order_by is not None:
+            if isinstance(order_by, str):
+                order_by = [order_by]
+
+            getters = [self.__column_getter(title) for title in order_by]
+
+            def key(match: tuple) -> tuple:
+                return tuple([get(match[0]) for get in getters])
+
+            # Top-N keeps only offset + limit rows instead of sorting all of them
+            if limit is None:
+                rows = sorted(rows, key=key, reverse=reverse)
+            elif reverse:
+                rows = heapq.nlargest(offset + limit, rows, key=key)
+            else:
+                rows = heapq.nsmallest(offset + limit, rows, key=key)
+
+        if offset or limit is not None:
+            rows = itertools.islice(rows, offset, None if limit is None else offset + limit)
+
+        return rows
+
+    def __column_getter(self, title: str) -> typing.Callable[[int], typing.Any]:
+        return self.__storage.getter(self.__column_index(title))
+
+    def __column_values(self, title: str) -> typing.Iterator:
+        return self.__storage.column(self.__columns.index(title))
+
+    def __index(self, title: str) -> typing.Union[HashIndex, SortedIndex, None]:
+        index = self.__indexes.get(title)
+
+        if index is not None and index.isDirty:
+            # Readers share the lock, one of them builds a dirty index
+            with self.__indexLock:
+                index = self.__indexes[title]
+
+                if index.isDirty:
+                    stored = self.__storage.stored_index(title) if self.isPaged else None
+
+                    if type(stored) is type(index):
+                        self.__indexes[title] = index = stored
+                    else:
+                        index.build(self.__column_values(title))
+
+        return index
+
+    def __ordered_index(self, order_by: typing.Union[str, list]) -> typing.Optional[SortedIndex]:
+        if not isinstance(order_by, str):
+            if len(order_by) != 1:
+                return None
+
+            order_by = order_by[0]
+
+        index = self.__index(order_by)
+        if isinstance(index, SortedIndex):
+            return index
+
+        return None
+
+    def __index_lookup(self, title: str, operator_name: str, item: typing.Any) -> typing.Optional[typing.Iterable]:
+        index = self.__index(title)
+        if index is None or item is None:
+            return None
+
+        try:
+            if operator_name == '==':
+                return index.lookup(item)
+            elif operator_name == 'in':
+                return [row_index for value in item for row_index in index.lookup(value)]
+            elif not isinstance(index, SortedIndex):
+                return None
+            elif operator_name == '<':
+                return index.range(high=item, include_high=False)
+            elif operator_name == '<=':
+                return index.range(high=item)
+            elif operator_name == '>':
+                return index.range(low=item, include_low=False)
+            elif operator_name == '>=':
+                return index.range(low=item)
+            elif operator_name == 'between':
+                return index.range(*item)
+            elif operator_name == 'startswith' and isinstance(item, str):
+                return index.prefix(item)
+        except TypeError:
+            # Unhashable or unorderable filter item, fall back to scanning
+            return None
+
+        return None
+
+    def __extreme_value(self, title: str, function: typing.Callable) -> typing.Any:
+        self.__table_creation_validator()
+        column_index = self.__column_index(title)
+
+        if not len(self.__storage):
+            return None
+
+        index = self.__index(title)
+        if isinstance(index, SortedIndex):
+            return index.min() if function is min else index.max()
+
+        return function(self.__storage.column(column_index))
+
+    def __merge(self, rows: list, primary_key: typing.Optional[str], merge: str):
+        if merge == 'keep':
+            self.__extend(rows)
+            return
+
+        if primary_key is None:
+            key = self.__row_fingerprint
+        else:
+            column_index = self.__columns.index(primary_key)
+
+            def key(row: list) -> typing.Any:
+                return row[column_index]
+
+        # Key of every row in the table and in the batch, mapped to its row index
+        row_keys = {key(row): row_index for row_index, row in enumerate(self.__storage.rows())}
+        batch = []
+
+        for row in rows:
+            row_key = key(row)
+            row_index = row_keys.get(row_key)
+
+            if row_index is None:
+                row_keys[row_key] = len(self.__storage) + len(batch)
+                batch.append(row)
+
+            elif merge == 'overwrite' and primary_key is not None:
+                if row_index < len(self.__storage):
+                    self.edit(row_index, **dict(zip(self.__columns, row)))
+                else:
+                    batch[row_index - len(self.__storage)] = row
+
+        self.__extend(batch)
+
+    @staticmethod
+    def __row_fingerprint(row: list) -> typing.Hashable:
+        try:
+            fingerprint = tuple(row)
+            hash(fingerprint)
+        except TypeError:
+            # Unhashable items like lists or dicts
+            fingerprint = pickle.dumps(row)
+
+        return fingerprint
+
+    def __extend(self, rows: list):
+        if not rows:
+            return
+
+        self.__batch_type_validator(rows)
+        self.__log('extend', rows)
+        self.__index_extend(len(self.__storage), rows)
+        self.__storage.extend(rows)
+
+    def __index_resolve(self):
+        # Stored indexes of a paged file match its rows until the first change, take them before it
+        # and keep them up to date instead of rebuilding them from all pages
+        if not self.isPaged or self.__storage.pageFile is None or self.__storage.isModified:
+            return
+
+        for title, index in list(self.__indexes.items()):
+            if index.isDirty:
+                self.__index(title)
+
+    def __index_extend(self, row_index: int, rows: list):
+        self.__index_resolve()
+
+        for title, index in self.__indexes.items():
+            if index.isDirty:
+                continue
+
+            column_index = self.__columns.index(title)
+            for offset, row in enumerate(rows):
+                index.add(row[column_index], row_index + offset)
+
+    def __index_discard(self, row_index: int, row: list):
+        self.__index_resolve()
+
+        for title, index in self.__indexes.items():
+            if not index.isDirty:
+                index.discard(row[self.__columns.index(title)], row_index)
+
+    def __index_shift(self, row_index: int, offset: int):
+        self.__index_resolve()
+
+        if row_index >= len(self.__storage):
+            return
+
+        for index in self.__indexes.values():
+            if not index.isDirty:
+                index.shift(row_index, offset)
+
+    def __index_invalidate(self):
+        # Row indexes are shifted, rebuild on next lookup
+        for index in self.__indexes.values():
+            index.isDirty = True
 
     def __table_creation_validator(self):
         if not self.__columns:
             raise error.TableCreationError("Table not created yet")
 
     def __row_index_validator(self, row_index: int):
-        try:
-            self.__rows[row_index]
-        except IndexError:
+        if not -len(self.__storage) <= row_index < len(self.__storage):
             raise error.RowNotFoundError(f"Row index {row_index} does not exist")
 
     def __item_type_validator(self, column_index: int, item: typing.Any):
         try:
-            first_row = self.__rows[0]
+            first_item = self.__storage.item(0, column_index)
         except IndexError:
             # No previous row to check last item type
             return
 
         item_type = type(item)
-        expected_type = type(first_row[column_index])
+        expected_type = type(first_item)
 
         if item_type is not expected_type:
             title = self.__columns[column_index]
             raise error.RowItemError(f"{title} type expected {expected_type}, but got {item_type}")
 
+    def __batch_type_validator(self, rows: list):
+        try:
+            first_row = self.__storage.row(0)
+        except IndexError:
+            # No previous row, the first row of the batch defines item types
+            first_row = rows[0]
+
+        for column_index, title in enumerate(self.__columns):
+            expected_type = type(first_row[column_index])
+            item_types = {type(row[column_index]) for row in rows}
+            item_types.discard(expected_type)
+
+            if item_types:
+                raise error.RowItemError(f"{title} type expected {expected_type}, but got {item_types.pop()}")
+
+    @staticmethod
+    def __query_validator(where: typing.Optional[Predicate], limit: typing.Optional[int], offset: int):
+        if where is not None and not isinstance(where, Predicate):
+            raise error.QueryError(f"where type expected Predicate, but got {type(where)}")
+        elif limit is not None and limit < 0:
+            raise error.QueryError(f"limit {limit} is negative")
+        elif offset < 0:
+            raise error.QueryError(f"offset {offset} is negative")
+
+    def __merge_validator(self, primary_key: typing.Optional[str], merge: str):
+        if merge not in ('skip', 'overwrite', 'keep'):
+            raise error.MergePolicyError(f"Merge policy {merge} is not supported")
+
+        # A whole row matches only an equal row, overwriting it changes nothing
+        if merge == 'overwrite' and primary_key is None:
+            raise error.MergePolicyError("Merge policy overwrite requires a primary key")
+
+        if primary_key is not None and primary_key not in self.__columns:
+            raise error.TitleUndefinedError(f"Title {primary_key} is not defined")
+
     def __attachment_validator(self):
         if not self.__drive.isAttachment:
             raise error.AttachmentStatusError("Attachment option is disabled")
@@ -0,0 +1,525 @@
+from .header import *
+from .crypto import Cipher, CipherCache
+from .compression import DecompressReader, compress, decompress
+from .storage import items_getter
+from . import error
+
+
+def rows_size(rows: list) -> int:
+    """
+    Estimate the memory held by rows from an even sample of them, items are measured shallow
+    and counted for every row even if rows share them
+    """
+
+    if not rows:
+        return sys.getsizeof(rows)
+
+    sample = rows[::max(1, len(rows) // pageSizeSamples)]
+    sample_size = sum(sys.getsizeof(row) + sum(map(sys.getsizeof, row)) for row in sample)
+
+    return sys.getsizeof(rows) + sample_size * len(rows) // len(sample)
+
+
+class PageCache(object):
+    """
+    Decrypted pages of paged files by (path, generation, page number) in least recently used order,
+    pages are dropped while their estimated size in memory is over the budget, the last read page is always kept
+    """
+
+    def __init__(self, budget: int = None):
+        self.budget = budget or pageCacheBytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.__pages = collections.OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.__pages)
+
+    def get(self, key: tuple) -> typing.Optional[list]:
+        """Get the rows of a cached page or None, counts a hit or a miss"""
+
+        with self.__lock:
+            page = self.__pages.get(key)
+
+            if page is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.__pages.move_to_end(key)
+
+            return page[0]
+
+    def put(self, key: tuple, rows: list, size: int):
+        """Cache the rows of a page and drop the least recently used pages over the budget"""
+
+        with self.__lock:
+            previous = self.__pages.pop(key, None)
+            if previous is not None:
+                self.size -= previous[1]
+
+            self.__pages[key] = (rows, size)
+            self.size += size
+
+            while self.size > self.budget and len(self.__pages) > 1:
+                _, (_, dropped_size) = self.__pages.popitem(last=False)
+                self.size -= dropped_size
+
+    def discard(self, path: str, generation: bytes):
+        """Drop the pages of a file"""
+
+        with self.__lock:
+            for key in [key for key in self.__pages if key[:2] == (path, generation)]:
+                self.size -= self.__pages.pop(key)[1]
+
+    def info(self) -> dict:
+        """Get hits, misses, cached pages, their size and the budget"""
+
+        with self.__lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'pages': len(self.__pages),
+                'size': self.size,
+                'budget': self.budget,
+            }
+
+    def clear(self):
+        """Drop all pages and reset the counters"""
+
+        with self.__lock:
+            self.__pages.clear()
+            self.size = 0
+            self.hits = 0
+            self.misses = 0
+
+
+class PageFile(object):
+    """
+    Paged database file read through mmap, pages are decrypted on demand and the recent ones are cached,
+    file layout: signature, version, encrypted flag, salt, pages, index frames, directory frame,
+    then offset and size of the directory, every frame is encrypted on its own,
+    the directory frame authenticates the header and the pages by their ids
+    """
+
+    version = 4
+
+    def __init__(
+            self, path: str, signature: bytes, password: str = None, ciphers: CipherCache = None,
+            cache: PageCache = None
+    ):
+        self.path = path
+        self.salt = None
+        self.__cipher = None
+
+        # Files of an engine share one cache, its budget bounds the decrypted pages of all of them
+        self.cache = cache if cache is not None else PageCache()
+
+        with open(path, 'rb') as file:
+            self.__map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            directory = self.__read_directory(signature, password, ciphers)
+        except BaseException:
+            self.__map.close()
+            raise
+
+        self.columns = directory['columns']
+        self.indexes = directory['indexes']
+        self.pages = directory['pages']
+        self.generation = directory['generation']
+        self.nextId = directory['nextId']
+
+    def __len__(self) -> int:
+        return len(self.pages)
+
+    @staticmethod
+    def is_paged(file: typing.BinaryIO, signature: bytes) -> bool:
+        """Check the file starts with the signature and paged version, the file position is restored"""
+
+        position = file.tell()
+        header = file.read(len(signature) + 1)
+        file.seek(position)
+
+        return header == signature + struct.pack('<B', PageFile.version)
+
+    def page(self, number: int) -> list:
+        """
+        Get rows of a page, don't change them, they're shared by the cache
+        :exception error.WrongKeyError
+        :exception EOFError
+        """
+
+        key = (self.path, self.generation, number)
+        rows = self.cache.get(key)
+
+        if rows is None:
+            offset, size, _, page_id = self.pages[number]
+            data = self.__read(offset, size, b'page' + struct.pack('<Q', page_id))
+            rows = pickle.loads(data)
+            self.cache.put(key, rows, rows_size(rows))
+
+        return rows
+
+    def raw_page(self, number: int) -> bytes:
+        """Get a page frame as it's stored"""
+
+        offset, size, _, _ = self.pages[number]
+
+        return self.__map[offset:offset + size]
+
+    def index(self, title: str) -> typing.Any:
+        """
+        Get the index stored for a column or None
+        :exception error.WrongKeyError
+        :exception EOFError
+        """
+
+        if title not in self.indexes:
+            return None
+
+        _, offset, size = self.indexes[title]
+
+        return pickle.loads(self.__read(offset, size, b'index' + title.encode()))
+
+    def close(self):
+        """Unmap the file and drop its cached pages"""
+
+        self.cache.discard(self.path, self.generation)
+        self.__map.close()
+
+    def __read_directory(self, signature: bytes, password: typing.Optional[str], ciphers: CipherCache) -> dict:
+        header_size = len(signature) + struct.calcsize('<BB')
+        if self.__map[:len(signature)] != signature or len(self.__map) < header_size + struct.calcsize('<QQ'):
+            raise error.SignatureNotFoundError("Signature not found")
+
+        version, encrypted = struct.unpack('<BB', self.__map[len(signature):header_size])
+        if version != self.version:
+            raise error.SignatureNotFoundError(f"Database version {version} is not supported")
+
+        if encrypted:
+            if not password:
+                raise error.WrongKeyError("Database is encrypted")
+
+            self.salt = self.__map[header_size:header_size + saltSize]
+            self.__cipher = ciphers.get(password, self.salt) if ciphers is not None else Cipher(password, self.salt)
+            header_size += saltSize
+
+        elif password:
+            # Pages written without the key must not be loaded into an encrypted database
+            raise error.WrongKeyError("Database is not encrypted")
+
+        offset, size = struct.unpack('<QQ', self.__map[-struct.calcsize('<QQ'):])
+
+        return pickle.loads(self.__read(offset, size, b'directory' + self.__map[:header_size]))
+
+    def __read(self, offset: int, size: int, associated_data: bytes) -> bytes:
+        data = self.__map[offset:offset + size]
+        if len(data) < size:
+            raise EOFError("Database is truncated")
+
+        if self.__cipher is not None:
+            # Associated data binds a frame to its place, frames can't be swapped
+            data = self.__cipher.decrypt(data, associated_data)
+
+        if data[:len(DecompressReader.magic)] == DecompressReader.magic:
+            data = decompress(data)
+
+        return data
+
+
+class PageWriter(object):
+    """
+    Write a paged database file, pages of a PageFile encrypted with the same key
+    are copied as they are without decrypting them
+    """
+
+    def __init__(
+            self, file: typing.BinaryIO, signature: bytes, cipher: Cipher = None,
+            compression: str = None, compression_level: int = None, next_id: int = 0
+    ):
+        self.__file = file
+        self.__cipher = cipher
+        self.__compression = compression
+        self.__compressionLevel = compression_level
+        self.__nextId = next_id
+        self.__pages = []
+        self.__indexes = {}
+
+        header = signature + struct.pack('<BB', PageFile.version, cipher is not None)
+        if cipher is not None:
+            header += cipher.salt
+
+        self.__file.write(header)
+        self.__header = header
+        self.__offset = len(header)
+
+    def write_page(self, rows: list):
+        """Write rows as a new page"""
+
+        page_id = self.__nextId
+        self.__nextId += 1
+
+        offset, size = self.__write(pickle.dumps(rows), b'page' + struct.pack('<Q', page_id))
+        self.__pages.append((offset, size, len(rows), page_id))
+
+    def copy_page(self, page_file: PageFile, number: int):
+        """Copy a page of a file encrypted with the same key"""
+
+        _, _, count, page_id = page_file.pages[number]
+        data = page_file.raw_page(number)
+
+        self.__file.write(data)
+        self.__pages.append((self.__offset, len(data), count, page_id))
+        self.__offset += len(data)
+
+    def write_index(self, title: str, ordered: bool, index: typing.Any):
+        """Write a built index of a column"""
+
+        offset, size = self.__write(pickle.dumps(index), b'index' + title.encode())
+        self.__indexes[title] = (ordered, offset, size)
+
+    def close(self, columns: list, generation: bytes):
+        """Write the directory, the underlying file is left open"""
+
+        offset, size = self.__write(pickle.dumps({
+            'columns': columns,
+            'indexes': self.__indexes,
+            'pages': self.__pages,
+            'generation': generation,
+            'nextId': self.__nextId,
+        }), b'directory' + self.__header)
+
+        self.__file.write(struct.pack('<QQ', offset, size))
+
+    def __write(self, data: bytes, associated_data: bytes) -> typing.Tuple[int, int]:
+        if self.__compression is not None:
+            data = compress(data, self.__compression, self.__compressionLevel)
+
+        if self.__cipher is not None:
+            data = self.__cipher.encrypt(data, associated_data)
+
+        self.__file.write(data)
+        offset = self.__offset
+        self.__offset += len(data)
+
+        return offset, len(data)
+
+
+class PagedStorage(object):
+    """
+    Rows are stored in pages of a PageFile and read on demand,
+    changed pages are kept in memory until the next dump
+    """
+
+    def __init__(self, column_count: int, page_file: PageFile = None):
+        self.pageFile = page_file
+        self.isModified = False
+
+        # Each page: [row count, rows in memory or None, page number in the file or None]
+        self.__pages = []
+        if page_file is not None:
+            self.__pages = [[count, None, number] for number, (_, _, count, _) in enumerate(page_file.pages)]
+
+        self.__length = sum(page[0] for page in self.__pages)
+        self.__starts = None
+
+    def __len__(self) -> int:
+        return self.__length
+
+    def row(self, row_index: int) -> list:
+        """
+        Get all items of a row
+        :exception IndexError
+        """
+
+        position, offset = self.__locate(row_index)
+        return self.__rows(position)[offset]
+
+    def rows(self) -> typing.Iterator[list]:
+        """Get all rows ordered by row index"""
+
+        for position in range(len(self.__pages)):
+            yield from self.__rows(position)
+
+    def item(self, row_index: int, column_index: int) -> typing.Any:
+        """
+        Get an item of a row
+        :exception IndexError
+        """
+
+        return self.row(row_index)[column_index]
+
+    def column(self, column_index: int) -> typing.Iterator:
+        """Get all items of a column ordered by row index"""
+
+        return (row[column_index] for row in self.rows())
+
+    def getter(self, column_index: int) -> typing.Callable[[int], typing.Any]:
+        """Get a function returns the item of a column by row index"""
+
+        return lambda row_index: self.row(row_index)[column_index]
+
+    def select(
+            self, row_indexes: typing.Optional[typing.Iterable[int]], column_indexes: list, filters: list,
+            where: typing.Callable[[int], bool] = None
+    ) -> typing.Iterator[typing.Tuple[int, tuple]]:
+        """
+        Get projected items of rows match all filters and where function, EX: filters=[(column_index, item)]
+        :exception IndexError
+        """
+
+        getter = items_getter(column_indexes)
+
+        if row_indexes is None:
+            selected = enumerate(self.rows())
+        else:
+            # Sorted row indexes read each page once
+            selected = ((row_index, self.row(row_index)) for row_index in row_indexes)
+
+        for row_index, row in selected:
+            for column_index, item in filters:
+                if row[column_index] != item:
+                    break
+            else:
+                if where is None or where(row_index):
+                    yield row_index, getter(row)
+
+    def pages(self) -> typing.Iterator[typing.Tuple[typing.Optional[list], typing.Optional[int]]]:
+        """Get (rows, None) of pages to write and (None, page number) of pages unchanged in the file"""
+
+        rows = []
+
+        for _, page_rows, number in self.__pages:
+            if page_rows is not None:
+                rows.extend(page_rows)
+
+                while len(rows) >= pageRows:
+                    yield rows[:pageRows], None
+                    del rows[:pageRows]
+
+                continue
+
+            if rows:
+                yield rows, None
+                rows = []
+
+            yield None, number
+
+        if rows:
+            yield rows, None
+
+    def stored_index(self, title: str) -> typing.Any:
+        """
+        Get the index stored for a column if no row is changed since the file is opened, otherwise None
+        :exception error.WrongKeyError
+        :exception EOFError
+        """
+
+        if self.pageFile is None or self.isModified:
+            return None
+
+        return self.pageFile.index(title)
+
+    def append(self, row: list):
+        self.extend([row])
+
+    def extend(self, rows: list):
+        if not rows:
+            return
+
+        start = 0
+        if self.__pages and self.__pages[-1][1] is not None and self.__pages[-1][0] < pageRows:
+            # Fill the last page if it's changed already, unchanged pages are not read for appending
+            page = self.__pages[-1]
+            start = pageRows - page[0]
+            page[1].extend(rows[:start])
+            page[0] = len(page[1])
+
+        for i in range(start, len(rows), pageRows):
+            page_rows = rows[i:i + pageRows]
+            self.__pages.append([len(page_rows), page_rows, None])
+
+        self.__length += len(rows)
+        self.__starts = None
+        self.isModified = True
+
+    def insert(self, row_index: int, row: list):
+        if row_index >= self.__length:
+            self.append(row)
+            return
+
+        position, offset = self.__locate(row_index)
+        rows = self.__edit(position)
+        rows.insert(offset, row)
+        self.__pages[position][0] += 1
+
+        if len(rows) > 2 * pageRows:
+            # Split a page grown by inserts
+            self.__pages[position:position + 1] = [
+                [pageRows, rows[:pageRows], None], [len(rows) - pageRows, rows[pageRows:], None]
+            ]
+
+        self.__length += 1
+        self.__starts = None
+
+    def replace(self, row_index: int, row: list):
+        position, offset = self.__locate(row_index)
+        self.__edit(position)[offset] = row
+
+    def delete(self, row_index: int):
+        position, offset = self.__locate(row_index)
+        del self.__edit(position)[offset]
+        self.__pages[position][0] -= 1
+
+        if not self.__pages[position][0]:
+            del self.__pages[position]
+
+        self.__length -= 1
+        self.__starts = None
+
+    def delete_column(self, column_index: int):
+        for position in range(len(self.__pages)):
+            rows = self.__edit(position)
+            rows[:] = [row[:column_index] + row[column_index + 1:] for row in rows]
+
+    def clear(self):
+        self.__pages = []
+        self.__length = 0
+        self.__starts = None
+        self.isModified = True
+
+    def __locate(self, row_index: int) -> typing.Tuple[int, int]:
+        if not -self.__length <= row_index < self.__length:
+            raise IndexError("row index out of range")
+
+        row_index %= self.__length
+
+        if self.__starts is None:
+            self.__starts = list(itertools.accumulate([page[0] for page in self.__pages[:-1]], initial=0))
+
+        position = bisect.bisect_right(self.__starts, row_index) - 1
+
+        return position, row_index - self.__starts[position]
+
+    def __rows(self, position: int) -> list:
+        _, rows, number = self.__pages[position]
+
+        if rows is None:
+            return self.pageFile.page(number)
+
+        return rows
+
+    def __edit(self, position: int) -> list:
+        page = self.__pages[position]
+
+        if page[1] is None:
+            # Copy the page into memory, the cached rows stay unchanged
+            page[1] = list(self.pageFile.page(page[2]))
+            page[2] = None
+
+        self.isModified = True
+
+        return page[1]
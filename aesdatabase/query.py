@@ -0,0 +1,197 @@
+from .header import *
+
+
+ItemGetter = typing.Callable[[str], typing.Callable[[int], typing.Any]]
+IndexLookup = typing.Callable[[str, str, typing.Any], typing.Optional[typing.Iterable[int]]]
+
+
+class Row(tuple):
+    """Lightweight row, items are ordered as titles and readable as attributes"""
+
+    __slots__ = ()
+    titles = ()
+
+    def __getattr__(self, title: str) -> typing.Any:
+        try:
+            return self[self.titles.index(title)]
+        except ValueError:
+            raise AttributeError(f"Title {title} is not selected")
+
+    def as_dict(self) -> dict:
+        """Get a dict view of the row"""
+
+        return dict(zip(self.titles, self))
+
+
+def row_factory(titles: list) -> typing.Type[Row]:
+    """Get a row type for the titles, build it once per select"""
+
+    return type('Row', (Row,), {'__slots__': (), 'titles': tuple(titles)})
+
+
+class Predicate(abc.ABC):
+    """Base of all where conditions, combine them with & | ~"""
+
+    def __and__(self, other: 'Predicate') -> 'Predicate':
+        return And(self, other)
+
+    def __or__(self, other: 'Predicate') -> 'Predicate':
+        return Or(self, other)
+
+    def __invert__(self) -> 'Predicate':
+        return Not(self)
+
+    @abc.abstractmethod
+    def compile(self, getter: ItemGetter) -> typing.Callable[[int], bool]:
+        """
+        Get a function checks a row index, getter(title) returns an item getter of the column
+        :exception error.TitleUndefinedError
+        """
+
+    def plan(self, lookup: IndexLookup) -> typing.Optional[set]:
+        """
+        Get candidate row indexes from indexes or None for a full scan,
+        lookup(title, operator, item) returns matched row indexes or None if the index can't serve it
+        """
+
+        return None
+
+
+class Comparison(Predicate):
+    operators = {
+        '==': operator.eq,
+        '!=': operator.ne,
+        '<': operator.lt,
+        '<=': operator.le,
+        '>': operator.gt,
+        '>=': operator.ge,
+        'in': lambda item, items: item in items,
+        'between': lambda item, bounds: bounds[0] <= item <= bounds[1],
+        'startswith': lambda item, prefix: isinstance(item, str) and item.startswith(prefix),
+    }
+
+    def __init__(self, title: str, operator_name: str, item: typing.Any):
+        self.title = title
+        self.operator = operator_name
+        self.item = item
+
+    def __repr__(self) -> str:
+        return f"Col({self.title!r}) {self.operator} {self.item!r}"
+
+    def compile(self, getter: ItemGetter) -> typing.Callable[[int], bool]:
+        get = getter(self.title)
+        function = self.operators[self.operator]
+        item = self.item
+        return lambda row_index: function(get(row_index), item)
+
+    def plan(self, lookup: IndexLookup) -> typing.Optional[set]:
+        row_indexes = lookup(self.title, self.operator, self.item)
+        if row_indexes is None:
+            return None
+
+        return set(row_indexes)
+
+
+class And(Predicate):
+    def __init__(self, left: Predicate, right: Predicate):
+        self.left = left
+        self.right = right
+
+    def __repr__(self) -> str:
+        return f"({self.left!r}) & ({self.right!r})"
+
+    def compile(self, getter: ItemGetter) -> typing.Callable[[int], bool]:
+        left = self.left.compile(getter)
+        right = self.right.compile(getter)
+        return lambda row_index: left(row_index) and right(row_index)
+
+    def plan(self, lookup: IndexLookup) -> typing.Optional[set]:
+        left = self.left.plan(lookup)
+        right = self.right.plan(lookup)
+
+        if left is None:
+            return right
+        elif right is None:
+            return left
+
+        return left & right
+
+
+class Or(Predicate):
+    def __init__(self, left: Predicate, right: Predicate):
+        self.left = left
+        self.right = right
+
+    def __repr__(self) -> str:
+        return f"({self.left!r}) | ({self.right!r})"
+
+    def compile(self, getter: ItemGetter) -> typing.Callable[[int], bool]:
+        left = self.left.compile(getter)
+        right = self.right.compile(getter)
+        return lambda row_index: left(row_index) or right(row_index)
+
+    def plan(self, lookup: IndexLookup) -> typing.Optional[set]:
+        left = self.left.plan(lookup)
+        right = self.right.plan(lookup)
+
+        if left is None or right is None:
+            return None
+
+        return left | right
+
+
+class Not(Predicate):
+    def __init__(self, predicate: Predicate):
+        self.predicate = predicate
+
+    def __repr__(self) -> str:
+        return f"~({self.predicate!r})"
+
+    def compile(self, getter: ItemGetter) -> typing.Callable[[int], bool]:
+        predicate = self.predicate.compile(getter)
+        return lambda row_index: not predicate(row_index)
+
+
+class Col(object):
+    """
+    Column reference to build where conditions,
+    EX: (Col('age') >= 18) & Col('name').startswith('a')
+    """
+
+    def __init__(self, title: str):
+        self.title = title
+
+    def __eq__(self, item: typing.Any) -> Comparison:
+        return Comparison(self.title, '==', item)
+
+    def __ne__(self, item: typing.Any) -> Comparison:
+        return Comparison(self.title, '!=', item)
+
+    def __lt__(self, item: typing.Any) -> Comparison:
+        return Comparison(self.title, '<', item)
+
+    def __le__(self, item: typing.Any) -> Comparison:
+        return Comparison(self.title, '<=', item)
+
+    def __gt__(self, item: typing.Any) -> Comparison:
+        return Comparison(self.title, '>', item)
+
+    def __ge__(self, item: typing.Any) -> Comparison:
+        return Comparison(self.title, '>=', item)
+
+    __hash__ = None
+
+    def isin(self, items: typing.Iterable) -> Comparison:
+        try:
+            items = frozenset(items)
+        except TypeError:
+            # Unhashable items are checked one by one
+            items = tuple(items)
+
+        return Comparison(self.title, 'in', items)
+
+    def startswith(self, prefix: str) -> Comparison:
+        return Comparison(self.title, 'startswith', prefix)
+
+    def between(self, low: typing.Any, high: typing.Any) -> Comparison:
+        return Comparison(self.title, 'between', (low, high))
@@ -0,0 +1,312 @@
+from .header import *
+
+
+class BoolColumn(object):
+    """Bool items are stored as one byte each"""
+
+    def __init__(self, items: typing.Iterable = ()):
+        self.__items = array.array('b', items)
+
+    def __len__(self) -> int:
+        return len(self.__items)
+
+    def __iter__(self) -> typing.Iterator[bool]:
+        return map(bool, self.__items)
+
+    def __getitem__(self, index: int) -> bool:
+        return bool(self.__items[index])
+
+    def __setitem__(self, index: int, item: bool):
+        self.__items[index] = item
+
+    def __delitem__(self, index: typing.Union[int, slice]):
+        del self.__items[index]
+
+    def append(self, item: bool):
+        self.__items.append(item)
+
+    def extend(self, items: typing.Iterable[bool]):
+        self.__items.extend(items)
+
+    def insert(self, index: int, item: bool):
+        self.__items.insert(index, item)
+
+
+class StringColumn(list):
+    """Str items are interned, repeated values share one object"""
+
+    def __init__(self, items: typing.Iterable = ()):
+        super().__init__(map(sys.intern, items))
+
+    def __setitem__(self, index: int, item: str):
+        super().__setitem__(index, sys.intern(item))
+
+    def append(self, item: str):
+        super().append(sys.intern(item))
+
+    def extend(self, items: typing.Iterable[str]):
+        super().extend(map(sys.intern, items))
+
+    def insert(self, index: int, item: str):
+        super().insert(index, sys.intern(item))
+
+
+def items_getter(indexes: list) -> typing.Callable[[typing.Sequence], tuple]:
+    """Get a function returns the items of the indexes as a tuple"""
+
+    if len(indexes) == 1:
+        index = indexes[0]
+        return lambda row: (row[index],)
+    elif not indexes:
+        return lambda row: ()
+
+    return operator.itemgetter(*indexes)
+
+
+def column_factory(item_type: type) -> typing.MutableSequence:
+    """Get an empty column container fits the item type"""
+
+    if item_type is bool:
+        return BoolColumn()
+    elif item_type is int:
+        return array.array('q')
+    elif item_type is float:
+        return array.array('d')
+    elif item_type is str:
+        return StringColumn()
+
+    return []
+
+
+class RowStorage(object):
+    """Rows are stored as a list of lists"""
+
+    def __init__(self, column_count: int):
+        self.__rows = []
+
+    def __len__(self) -> int:
+        return len(self.__rows)
+
+    def row(self, row_index: int) -> list:
+        """
+        Get all items of a row
+        :exception IndexError
+        """
+
+        return self.__rows[row_index]
+
+    def rows(self) -> typing.Iterator[list]:
+        """Get all rows ordered by row index"""
+
+        return iter(self.__rows)
+
+    def item(self, row_index: int, column_index: int) -> typing.Any:
+        """
+        Get an item of a row
+        :exception IndexError
+        """
+
+        return self.__rows[row_index][column_index]
+
+    def column(self, column_index: int) -> typing.Iterator:
+        """Get all items of a column ordered by row index"""
+
+        return (row[column_index] for row in self.__rows)
+
+    def getter(self, column_index: int) -> typing.Callable[[int], typing.Any]:
+        """Get a function returns the item of a column by row index"""
+
+        rows = self.__rows
+        return lambda row_index: rows[row_index][column_index]
+
+    def select(
+            self, row_indexes: typing.Optional[typing.Iterable[int]], column_indexes: list, filters: list,
+            where: typing.Callable[[int], bool] = None
+    ) -> typing.Iterator[typing.Tuple[int, tuple]]:
+        """
+        Get projected items of rows match all filters and where function, EX: filters=[(column_index, item)]
+        :exception IndexError
+        """
+
+        getter = items_getter(column_indexes)
+        rows = self.__rows
+
+        if row_indexes is None:
+            selected = enumerate(rows)
+        else:
+            selected = ((row_index, rows[row_index]) for row_index in row_indexes)
+
+        for row_index, row in selected:
+            for column_index, item in filters:
+                if row[column_index] != item:
+                    break
+            else:
+                if where is None or where(row_index):
+                    yield row_index, getter(row)
+
+    def append(self, row: list):
+        self.__rows.append(row)
+
+    def extend(self, rows: list):
+        self.__rows.extend(rows)
+
+    def insert(self, row_index: int, row: list):
+        self.__rows.insert(row_index, row)
+
+    def replace(self, row_index: int, row: list):
+        self.__rows[row_index] = row
+
+    def delete(self, row_index: int):
+        del self.__rows[row_index]
+
+    def delete_column(self, column_index: int):
+        for row in self.__rows:
+            del row[column_index]
+
+    def clear(self):
+        self.__rows.clear()
+
+
+class ColumnStorage(object):
+    """Rows are stored as one typed container per column"""
+
+    def __init__(self, column_count: int):
+        self.__columns = [[] for _ in range(column_count)]
+        self.__length = 0
+
+    def __len__(self) -> int:
+        return self.__length
+
+    def row(self, row_index: int) -> list:
+        """
+        Get all items of a row
+        :exception IndexError
+        """
+
+        row_index = self.__row_index(row_index)
+        return [column[row_index] for column in self.__columns]
+
+    def rows(self) -> typing.Iterator[list]:
+        """Get all rows ordered by row index"""
+
+        if not self.__columns:
+            return ([] for _ in range(self.__length))
+
+        return map(list, zip(*self.__columns))
+
+    def item(self, row_index: int, column_index: int) -> typing.Any:
+        """
+        Get an item of a row
+        :exception IndexError
+        """
+
+        return self.__columns[column_index][self.__row_index(row_index)]
+
+    def column(self, column_index: int) -> typing.Iterator:
+        """Get all items of a column ordered by row index"""
+
+        return iter(self.__columns[column_index])
+
+    def getter(self, column_index: int) -> typing.Callable[[int], typing.Any]:
+        """Get a function returns the item of a column by row index"""
+
+        return self.__columns[column_index].__getitem__
+
+    def select(
+            self, row_indexes: typing.Optional[typing.Iterable[int]], column_indexes: list, filters: list,
+            where: typing.Callable[[int], bool] = None
+    ) -> typing.Iterator[typing.Tuple[int, tuple]]:
+        """
+        Get projected items of rows match all filters and where function, EX: filters=[(column_index, item)]
+        :exception IndexError
+        """
+
+        columns = [self.__columns[i] for i in column_indexes]
+        filters = [(self.__columns[i], item) for i, item in filters]
+
+        if row_indexes is None:
+            if filters:
+                # Scan the first filter column only, the others are checked per matched row
+                first_column, first_item = filters.pop(0)
+                row_indexes = (i for i, item in enumerate(first_column) if item == first_item)
+            elif where is not None:
+                row_indexes = range(self.__length)
+            elif columns:
+                yield from enumerate(zip(*columns))
+                return
+            else:
+                yield from ((row_index, ()) for row_index in range(self.__length))
+                return
+
+        for row_index in row_indexes:
+            for column, item in filters:
+                if column[row_index] != item:
+                    break
+            else:
+                if where is None or where(row_index):
+                    yield row_index, tuple([column[row_index] for column in columns])
+
+    def append(self, row: list):
+        self.extend([row])
+
+    def extend(self, rows: list):
+        if not rows:
+            return
+
+        if not self.__length:
+            # The first row defines the container type of each column
+            self.__columns = [column_factory(type(item)) for item in rows[0]]
+
+        for column_index in range(len(self.__columns)):
+            self.__write(column_index, 'extend', [row[column_index] for row in rows])
+
+        self.__length += len(rows)
+
+    def insert(self, row_index: int, row: list):
+        if not self.__length:
+            self.extend([row])
+            return
+
+        for column_index, item in enumerate(row):
+            self.__write(column_index, 'insert', row_index, item)
+
+        self.__length += 1
+
+    def replace(self, row_index: int, row: list):
+        row_index = self.__row_index(row_index)
+
+        for column_index, item in enumerate(row):
+            self.__write(column_index, '__setitem__', row_index, item)
+
+    def delete(self, row_index: int):
+        row_index = self.__row_index(row_index)
+
+        for column in self.__columns:
+            del column[row_index]
+
+        self.__length -= 1
+
+    def delete_column(self, column_index: int):
+        del self.__columns[column_index]
+
+    def clear(self):
+        self.__columns = [[] for _ in self.__columns]
+        self.__length = 0
+
+    def __row_index(self, row_index: int) -> int:
+        if not -self.__length <= row_index < self.__length:
+            raise IndexError("row index out of range")
+
+        return row_index % self.__length
+
+    def __write(self, column_index: int, method: str, *args):
+        column = self.__columns[column_index]
+        length = len(column)
+
+        try:
+            getattr(column, method)(*args)
+        except OverflowError:
+            # Int item is out of the typed array range, fall back to a list
+            del column[length:]
+            column = self.__columns[column_index] = list(column)
+            getattr(column, method)(*args)
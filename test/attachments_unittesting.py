@@ -1,5 +1,8 @@
 from aesdatabase import *
 import unittest
+import io
+import hashlib
+import concurrent.futures
 
 
 drive = DriveSetup(add_attachment=True)
@@ -138,6 +141,569 @@ class MyTestCase(unittest.TestCase):
         self.assertIsInstance(result, bool)
         self.assertFalse(result)
 
+    def test6_import_attachments(self):
+        function_name('import_attachments')
+
+        # Task
+        items = []
+        for i in range(8):
+            path = 'test%s.txt' % i
+            with open(path, 'w') as file:
+                file.write('hello world %s!' % i)
+
+            items.append(('batch%s' % (i % 2), path))
+
+        items.append(('batch0', 'missing.txt'))  # Failed case
+        results = db.import_attachments(items, workers=4)
+        exists = [(output_path, os.path.exists(output_path)) for _, _, output_path, _ in results if output_path]
+        exists_attachments = [db.exists_attachment(name_, path) for name_, path in items[:-1]]
+
+        for name_, path in items[:-1]:
+            os.remove(path)
+            db.remove_attachment(name_, path)
+
+        # Debugging
+        if debugging:
+            print(f"""
+            results: {results}
+            """)
+
+        # Test
+        self.assertEqual(len(results), len(items))
+        for (name_, path), (result_name, result_path, output_path, issue) in zip(items, results):
+            self.assertEqual((name_, path), (result_name, result_path))
+
+            if path == 'missing.txt':
+                self.assertIsNone(output_path)
+                self.assertIsInstance(issue, FileNotFoundError)
+            else:
+                self.assertIsNone(issue)
+
+        self.assertEqual(len(exists), 8)
+        self.assertTrue(all(exist for _, exist in exists))
+        self.assertTrue(all(exists_attachments))
+        self.assertFalse(any(db.exists_attachment(name_, path) for name_, path in items))
+
+    def test7_export_attachments(self):
+        function_name('export_attachments')
+
+        # Task
+        selection = []
+        for i in range(8):
+            path = 'test%s.txt' % i
+            with open(path, 'w') as file:
+                file.write('hello world %s!' % i)
+
+            selection.append(('batch%s' % (i % 2), path))
+
+        db.import_attachments(selection, workers=4)
+        for _, path in selection:
+            os.remove(path)
+
+        selection.append(('batch0', 'missing.txt'))  # Failed case
+        output_dir = os.path.join(drive.tempDir, 'export')
+
+        results = list(db.export_attachments(selection, output_dir, workers=4))
+        changed_times = {
+            output_path: os.stat(output_path).st_ctime_ns for _, _, output_path, issue in results if issue is None
+        }
+
+        # Edit an exported file, it's exported again and the others are skipped
+        edited_path = os.path.join(output_dir, 'test0.txt')
+        with open(edited_path, 'w') as file:
+            file.write('edited')
+
+        results_again = list(db.export_attachments(selection, output_dir, workers=4))
+        skipped = [
+            output_path for _, _, output_path, issue in results_again
+            if issue is None and os.stat(output_path).st_ctime_ns == changed_times[output_path]
+        ]
+
+        with open(edited_path) as file:
+            edited_content = file.read()
+
+        shutil.rmtree(output_dir)
+        for name_, file_name_ in selection:
+            db.remove_attachment(name_, file_name_)
+
+        # Debugging
+        if debugging:
+            print(f"""
+            results: {results}
+            skipped: {skipped}
+            edited_content: {edited_content}
+            """)
+
+        # Test
+        self.assertEqual(sorted(result[:2] for result in results), sorted(selection))
+        self.assertEqual(len(changed_times), 8)
+        self.assertEqual(len(skipped), 7)
+        self.assertNotIn(edited_path, skipped)
+        self.assertEqual(edited_content, 'hello world 0!')
+
+    def test8_key_cache(self):
+        function_name('key_cache')
+
+        # Task
+        with open(file_name, 'w') as file:
+            file.write('hello world!')
+
+        db.import_attachment(name, file_name, ignore_file_exists=True)
+        calls = 10
+
+        # Micro-benchmark: derive keys on every call vs reuse the cached keys
+        start = time.perf_counter()
+        for _ in range(calls):
+            db.clear_key_cache()
+            db.export_attachment(name, file_name, ignore_file_exists=True)
+        uncached_time = (time.perf_counter() - start) / calls
+
+        start = time.perf_counter()
+        for _ in range(calls):
+            db.export_attachment(name, file_name, ignore_file_exists=True)
+        cached_time = (time.perf_counter() - start) / calls
+
+        db.remove_attachment(name, file_name)
+
+        # Debugging
+        if debugging:
+            print(f"""
+            uncached_time: {uncached_time * 1000:.3f} ms per call
+            cached_time: {cached_time * 1000:.3f} ms per call
+            """)
+
+        # Test
+        if password:
+            self.assertLess(cached_time, uncached_time)
+
+    def test9_open_attachment(self):
+        function_name('open_attachment')
+
+        # Task
+        data = os.urandom(3 * 1024 * 1024 + 7)
+        result = db.write_attachment(name, 'stream.bin', io.BytesIO(data))
+
+        with db.open_attachment(name, 'stream.bin') as file:
+            head = file.read(16)
+            file.seek(-16, os.SEEK_END)
+            tail = file.read()
+            file.seek(2 * 1024 * 1024 - 8)
+            middle = file.read(16)
+            file.seek(0)
+            content = file.read()
+
+        db.remove_attachment(name, 'stream.bin')
+
+        # Debugging
+        if debugging:
+            print(f"""
+            result: {result}
+            size: {len(content)}
+            head: {head}
+            """)
+
+        # Test
+        self.assertTrue(result.startswith(drive.attachmentDir))
+        self.assertEqual(head, data[:16])
+        self.assertEqual(tail, data[-16:])
+        self.assertEqual(middle, data[2 * 1024 * 1024 - 8:2 * 1024 * 1024 + 8])
+        self.assertEqual(content, data)
+
+    def test_10_attachment_catalog(self):
+        function_name('attachment_catalog')
+
+        # Task
+        data = b'hello catalog!'
+        db.write_attachment(name, 'catalog.txt', data, ignore_file_exists=True, row_index=3)
+        info = db.attachment_info(name, 'catalog.txt')
+
+        # Another engine loads the catalog file
+        other_db = DatabaseEngine(drive, password=password)
+        other_info = other_db.attachment_info(name, 'catalog.txt')
+        other_exists = other_db.exists_attachment(name, 'catalog.txt')
+
+        # Rebuild from attachment files, file hashes are unknown then
+        count = other_db.rebuild_attachment_catalog()
+        rebuilt_info = other_db.attachment_info(name, 'catalog.txt')
+
+        db.remove_attachment(name, 'catalog.txt')
+        removed_info = db.attachment_info(name, 'catalog.txt')
+
+        # Debugging
+        if debugging:
+            print(f"""
+            info: {info}
+            other_info: {other_info}
+            count: {count}
+            rebuilt_info: {rebuilt_info}
+            removed_info: {removed_info}
+            """)
+
+        # Test
+        self.assertEqual(info['size'], len(data))
+        self.assertEqual(info['hash'], hashlib.sha256(data).hexdigest())
+        self.assertEqual(info['row'], 3)
+        self.assertEqual(other_info, info)
+        self.assertTrue(other_exists)
+        self.assertGreaterEqual(count, 1)
+        self.assertIsNone(rebuilt_info['hash'])
+        self.assertIsNone(removed_info)
+        self.assertFalse(db.exists_attachment(name, 'catalog.txt'))
+
+    def test_11_deduplicated_attachments(self):
+        function_name('deduplicated_attachments')
+
+        # Task
+        dedup_db = DatabaseEngine(drive, password=password, deduplicate=True)
+        data = os.urandom(256 * 1024)
+
+        with open('duplicate.bin', 'wb') as file:
+            file.write(data)
+
+        results = [dedup_db.import_attachment('dedup%s' % i, 'duplicate.bin') for i in range(3)]
+        results.append(dedup_db.write_attachment('dedup3', 'other.bin', data))
+        os.remove('duplicate.bin')
+
+        blobs_before = sorted(os.listdir(os.path.join(drive.blobDir, os.path.basename(os.path.dirname(results[0])))))
+        with dedup_db.open_attachment('dedup3', 'other.bin') as file:
+            content = file.read()
+
+        # The blob is kept until its last reference is removed
+        exists_after_remove = []
+        for i in range(3):
+            dedup_db.remove_attachment('dedup%s' % i, 'duplicate.bin')
+            exists_after_remove.append(os.path.exists(results[0]))
+
+        dedup_db.remove_attachment('dedup3', 'other.bin')
+        exists_after_remove.append(os.path.exists(results[0]))
+
+        # Debugging
+        if debugging:
+            print(f"""
+            results: {results}
+            blobs_before: {blobs_before}
+            exists_after_remove: {exists_after_remove}
+            """)
+
+        # Test
+        self.assertEqual(len(set(results)), 1)
+        self.assertEqual(blobs_before, [os.path.basename(results[0])])
+        self.assertEqual(content, data)
+        self.assertEqual(exists_after_remove, [True, True, True, False])
+
+    def test_12_compressed_attachments(self):
+        function_name('compressed_attachments')
+
+        # Task
+        compressed_drive = DriveSetup(add_attachment=True, compression='zlib', compression_level=9)
+        compressed_db = DatabaseEngine(compressed_drive, password=password)
+        data = b'hello compressed attachment! ' * 100000
+
+        result = compressed_db.write_attachment(name, 'compressed.txt', data, ignore_file_exists=True)
+
+        # Other engines detect compression by the file header
+        with db.open_attachment(name, 'compressed.txt') as file:
+            file.seek(-10, os.SEEK_END)
+            tail = file.read()
+            file.seek(0)
+            content = file.read()
+
+        output_path = db.export_attachment(name, 'compressed.txt', ignore_file_exists=True)
+        with open(output_path, 'rb') as file:
+            exported = file.read()
+
+        stored_size = os.path.getsize(result)
+        os.remove(output_path)
+        compressed_db.remove_attachment(name, 'compressed.txt')
+
+        # Debugging
+        if debugging:
+            print(f"""
+            result: {result}
+            size: {len(data)}
+            stored_size: {stored_size}
+            """)
+
+        # Test
+        self.assertLess(stored_size, len(data) // 10)
+        self.assertEqual(tail, data[-10:])
+        self.assertEqual(content, data)
+        self.assertEqual(exported, data)
+
+    def test_13_shared_catalog(self):
+        function_name('shared_catalog')
+
+        # Task
+        other_db = DatabaseEngine(drive, password=password)
+        other_dedup_db = DatabaseEngine(drive, password=password, deduplicate=True)
+        exists_before = other_db.exists_attachment(name, 'shared.txt')
+        other_dedup_db.exists_attachment(name, 'shared.bin')
+
+        # Reads of other engines see the attachments written after their catalog is loaded
+        db.write_attachment(name, 'shared.txt', b'hello shared!', ignore_file_exists=True)
+        dedup_db = DatabaseEngine(drive, password=password, deduplicate=True)
+        dedup_db.write_attachment(name, 'shared.bin', b'hello shared blob!', ignore_file_exists=True)
+
+        exists_after = other_db.exists_attachment(name, 'shared.txt')
+        selected = list(other_db.select_attachments(name=name))
+        with other_dedup_db.open_attachment(name, 'shared.bin') as file:
+            content = file.read()
+
+        db.remove_attachment(name, 'shared.txt')
+        dedup_db.remove_attachment(name, 'shared.bin')
+
+        # Debugging
+        if debugging:
+            print(f"""
+            exists_before: {exists_before}
+            exists_after: {exists_after}
+            selected: {selected}
+            content: {content}
+            """)
+
+        # Test
+        self.assertFalse(exists_before)
+        self.assertTrue(exists_after)
+        self.assertEqual(len(selected), 2)
+        self.assertEqual(content, b'hello shared blob!')
+        self.assertFalse(other_db.exists_attachment(name, 'shared.txt'))
+
+    def test_14_multiprocess_catalog(self):
+        function_name('multiprocess_catalog')
+
+        # Task
+        names = ['process%s' % i for i in range(4)]
+        with concurrent.futures.ProcessPoolExecutor(4) as executor:
+            list(executor.map(write_attachments, names))
+
+        other_db = DatabaseEngine(drive, password=password)
+        entries = [path for name_ in names for path in other_db.select_attachments(name=name_)]
+        files = [
+            file_name_ for name_ in names for file_name_ in os.listdir(os.path.join(drive.attachmentDir, name_))
+        ]
+
+        for name_ in names:
+            for i in range(50):
+                other_db.remove_attachment(name_, 'file%s.txt' % i)
+
+        # Debugging
+        if debugging:
+            print(f"""
+            entries: {len(entries)}
+            files: {len(files)}
+            """)
+
+        # Test
+        self.assertEqual(len(entries), 4 * 50)
+        self.assertEqual(len(files), 4 * 50)
+
+    def test_15_multiprocess_deduplicated(self):
+        function_name('multiprocess_deduplicated')
+
+        # Task
+        names = ['dedup_process%s' % i for i in range(4)]
+        with concurrent.futures.ProcessPoolExecutor(4) as executor:
+            list(executor.map(write_deduplicated_attachments, names))
+
+        # A blob removed by one process while another references it can't be read anymore
+        dedup_db = DatabaseEngine(drive, password=password, deduplicate=True)
+        contents = []
+        blobs = set()
+
+        for name_ in names:
+            for i in range(1, 20, 2):
+                blobs.add(dedup_db.attachment_info(name_, 'same%s.txt' % i) is not None)
+                with dedup_db.open_attachment(name_, 'same%s.txt' % i) as file:
+                    contents.append(file.read())
+
+        paths = {path for name_ in names for path in dedup_db.select_attachments(name=name_)}
+
+        for name_ in names:
+            for i in range(1, 20, 2):
+                dedup_db.remove_attachment(name_, 'same%s.txt' % i)
+
+        # Debugging
+        if debugging:
+            print(f"""
+            contents: {len(contents)}
+            paths: {paths}
+            """)
+
+        # Test
+        self.assertEqual(blobs, {True})
+        self.assertEqual(contents, [b'hello same content!'] * 40)
+        self.assertEqual(len(paths), 1)
+        self.assertFalse(any(os.path.exists(path) for path in paths))
+
+    def test_16_truncated_export(self):
+        function_name('truncated_export')
+
+        # Task
+        compressed_drive = DriveSetup(add_attachment=True, compression='zlib')
+        compressed_db = DatabaseEngine(compressed_drive, password=password)
+        data = os.urandom(64 * 1024)
+        selection = [('truncated', 'broken.bin'), ('truncated', 'whole.bin')]
+
+        for name_, file_name_ in selection:
+            result = compressed_db.write_attachment(name_, file_name_, data, ignore_file_exists=True)
+
+            # Cut the compressed data of the first file
+            if file_name_ == 'broken.bin':
+                with open(result, 'r+b') as file:
+                    file.truncate(os.path.getsize(result) // 2)
+
+        output_dir = os.path.join(compressed_drive.tempDir, 'truncated')
+        results = sorted(compressed_db.export_attachments(selection, output_dir, workers=2), key=lambda item: item[1])
+        exported_files = os.listdir(output_dir)
+
+        shutil.rmtree(output_dir)
+        for name_, file_name_ in selection:
+            compressed_db.remove_attachment(name_, file_name_)
+
+        # Debugging
+        if debugging:
+            print(f"""
+            results: {results}
+            exported_files: {exported_files}
+            """)
+
+        # Test
+        self.assertEqual([result[:2] for result in results], selection)
+        self.assertEqual(exported_files, ['whole.bin'])
+        self.assertIsNone(results[0][2])
+        self.assertIsNotNone(results[0][3])
+        self.assertIsNone(results[1][3])
+
+    def test_17_forged_catalog(self):
+        function_name('forged_catalog')
+
+        # Task
+        db.write_attachment(name, 'catalog.txt', b'hello catalog!', ignore_file_exists=True)
+        with open(drive.catalogPath, 'rb') as file:
+            catalog = file.read()
+
+        # An entry written without the key points to another file
+        entry = {'size': None, 'mtime': None, 'hash': None, 'row': None, 'blob': '../../forged'}
+        record = pickle.dumps(('add', name, 'catalog.txt', entry))
+        magic_size = len(b'AESDatabaseJournal')
+        forged = catalog[:magic_size] + b'\x00' + catalog[magic_size + 1:magic_size + 17]
+
+        with open(drive.catalogPath, 'wb') as file:
+            file.write(forged + struct.pack('<I', len(record)) + record)
+
+        issue = None
+        try:
+            DatabaseEngine(drive, password=password).exists_attachment(name, 'catalog.txt')
+        except error.WrongKeyError as err:
+            issue = err
+
+        with open(drive.catalogPath, 'wb') as file:
+            file.write(catalog)
+
+        db.remove_attachment(name, 'catalog.txt')
+
+        # Debugging
+        if debugging:
+            print(f"""
+            issue: {issue!r}
+            """)
+
+        # Test
+        if password:
+            self.assertIsInstance(issue, error.WrongKeyError)
+
+    def test_18_export_same_file_name(self):
+        function_name('export_same_file_name')
+
+        # Task
+        selection = [('first', 'same.txt'), ('second', 'same.txt')]
+        for name_, file_name_ in selection:
+            db.write_attachment(name_, file_name_, ('hello %s!' % name_).encode(), ignore_file_exists=True)
+
+        output_dir = os.path.join(drive.tempDir, 'same')
+        results = list(db.export_attachments(selection, output_dir, workers=2))
+        exported_files = os.listdir(output_dir)
+
+        with open(os.path.join(output_dir, 'same.txt')) as file:
+            content = file.read()
+
+        shutil.rmtree(output_dir)
+        for name_, file_name_ in selection:
+            db.remove_attachment(name_, file_name_)
+
+        # Debugging
+        if debugging:
+            print(f"""
+            results: {results}
+            exported_files: {exported_files}
+            content: {content}
+            """)
+
+        # Test
+        exported = [result for result in results if result[3] is None]
+        failed = [result for result in results if result[3] is not None]
+        self.assertEqual(len(exported), 1)
+        self.assertEqual(len(failed), 1)
+        self.assertIsInstance(failed[0][3], FileExistsError)
+        self.assertEqual(content, 'hello %s!' % exported[0][0])
+        self.assertEqual(exported_files, ['same.txt'])
+
+    def test_19_spliced_attachment(self):
+        function_name('spliced_attachment')
+
+        # Task
+        first_path = db.write_attachment(name, 'first.txt', b'hello first!', ignore_file_exists=True)
+        second_path = db.write_attachment(name, 'second.txt', b'hello second!', ignore_file_exists=True)
+
+        # Frames of the second file after the header of the first one, both are encrypted with the same key
+        header_size = len(b'AESDatabaseStream') + struct.calcsize('<BI') + header.saltSize + header.streamIdSize
+        with open(first_path, 'rb') as file:
+            first = file.read()
+        with open(second_path, 'rb') as file:
+            second = file.read()
+
+        with open(first_path, 'wb') as file:
+            file.write(first[:header_size] + second[header_size:])
+
+        issue = None
+        try:
+            with db.open_attachment(name, 'first.txt') as file:
+                content = file.read()
+        except error.WrongKeyError as err:
+            issue = err
+            content = None
+
+        db.remove_attachment(name, 'first.txt')
+        db.remove_attachment(name, 'second.txt')
+
+        # Debugging
+        if debugging:
+            print(f"""
+            issue: {issue!r}
+            content: {content}
+            """)
+
+        # Test
+        if password:
+            self.assertIsInstance(issue, error.WrongKeyError)
+            self.assertIsNone(content)
+
+
+def write_deduplicated_attachments(name_: str):
+    process_db = DatabaseEngine(drive, password=password, deduplicate=True)
+
+    for i in range(20):
+        process_db.write_attachment(name_, 'same%s.txt' % i, b'hello same content!', ignore_file_exists=True)
+        if i % 2:
+            process_db.remove_attachment(name_, 'same%s.txt' % (i - 1))
+
+
+def write_attachments(name_: str):
+    process_db = DatabaseEngine(drive, password=password)
+
+    for i in range(50):
+        process_db.write_attachment(name_, 'file%s.txt' % i, ('hello %s!' % i).encode(), ignore_file_exists=True)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -72,6 +72,231 @@ class MyTestCase(unittest.TestCase):
                 row: {row}
                 """)
 
+    def test4_load_backup_merge(self):
+        function_name('load_backup_merge')
+
+        # Task
+        case1 = {'primary_key': 'id', 'merge': 'other'}   # Failed case
+        case2 = {'primary_key': 'other', 'merge': 'skip'}   # Failed case
+        case3 = {'primary_key': 'id', 'merge': 'skip'}
+        case4 = {'primary_key': 'id', 'merge': 'overwrite'}
+        case5 = {'primary_key': None, 'merge': 'keep'}
+        case6 = {'primary_key': None, 'merge': 'overwrite'}   # Failed case
+
+        for case in (case1, case2, case3, case4, case5, case6):
+            issue = ''
+            db.edit(0, username='edited')
+            count_before = db.count_row()
+
+            try:
+                db.load_backup(MyTestCase.outputPath, **case)
+                success = True
+            except (error.MergePolicyError, error.TitleUndefinedError) as err:
+                issue = err
+                success = False
+
+            count_after = db.count_row()
+            _, row = next(db.select(id=0))
+
+            # Debugging
+            if debugging:
+                print(f"""
+                arguments: {case}
+                success: {success}
+                issue: {issue}
+                count_before: {count_before}
+                count_after: {count_after}
+                row: {row}
+                """)
+
+            # Test
+            if case in (case1, case2, case6):
+                self.assertFalse(success)
+                self.assertAlmostEqual(count_after, count_before)
+            elif case is case3:
+                self.assertTrue(success)
+                self.assertAlmostEqual(count_after, count_before)
+                self.assertEqual(row['username'], 'edited')
+            elif case is case4:
+                self.assertTrue(success)
+                self.assertAlmostEqual(count_after, count_before)
+                self.assertEqual(row['username'], 'user0')
+            elif case is case5:
+                self.assertTrue(success)
+                self.assertAlmostEqual(count_after, count_before * 2)
+
+    def test5_list_backup_contents(self):
+        function_name('list_backup_contents')
+
+        # Task
+        for name in ('first', 'second'):
+            file_name = '%s.txt' % name
+            with open(file_name, 'w') as file:
+                file.write('hello %s!' % name)
+
+            db.import_attachment(name, file_name, ignore_file_exists=True)
+            os.remove(file_name)
+
+        output_path = db.dump_backup()
+        contents = db.list_backup_contents(output_path)
+
+        # Restore the selected attachment only
+        db.remove_attachment('first', 'first.txt')
+        db.remove_attachment('second', 'second.txt')
+        db.load_backup(output_path, attachment_names=['second'], primary_key='id')
+        restored = sorted(os.listdir(drive.attachmentDir))
+
+        # Debugging
+        if debugging:
+            print(f"""
+            contents: {contents}
+            restored: {restored}
+            """)
+
+        # Test
+        self.assertEqual(contents['rows'], db.count_row())
+        self.assertEqual(sorted(os.path.dirname(file_path) for file_path in contents['attachments']), ['first', 'second'])
+        self.assertEqual(restored, ['second'])
+
+    def test6_deduplicated_backup(self):
+        function_name('deduplicated_backup')
+
+        # Task
+        dedup_db = DatabaseEngine(drive, password=password, deduplicate=True)
+        dedup_db.create_table(['id'])
+        data = os.urandom(512 * 1024)
+
+        for i in range(4):
+            dedup_db.write_attachment('copy%s' % i, 'data.bin', data, ignore_file_exists=True)
+
+        output_path = dedup_db.dump_backup(attachment_names=['copy%s' % i for i in range(4)])
+        backup_size = os.path.getsize(output_path)
+
+        for i in range(4):
+            dedup_db.remove_attachment('copy%s' % i, 'data.bin')
+
+        dedup_db.load_backup(output_path)
+        with dedup_db.open_attachment('copy3', 'data.bin') as file:
+            content = file.read()
+
+        restored = {dedup_db.attachment_info('copy%s' % i, 'data.bin')['hash'] for i in range(4)}
+        stored_paths = {path for path in dedup_db.select_attachments() if path.startswith(drive.blobDir)}
+
+        for i in range(4):
+            dedup_db.remove_attachment('copy%s' % i, 'data.bin')
+
+        # Debugging
+        if debugging:
+            print(f"""
+            backup_size: {backup_size}
+            restored: {restored}
+            stored_paths: {stored_paths}
+            """)
+
+        # Test
+        self.assertLess(backup_size, 2 * len(data))
+        self.assertEqual(content, data)
+        self.assertEqual(len(restored), 1)
+        self.assertEqual(len(stored_paths), 1)
+
+    def test7_compressed_backup(self):
+        function_name('compressed_backup')
+
+        # Task
+        compressed_drive = DriveSetup(add_backup=True, compression='zlib')
+        compressed_db = DatabaseEngine(compressed_drive, password=password)
+        compressed_db.create_table(['id', 'username', 'password'])
+        compressed_db.insert_many({'id': i, 'username': 'user%s' % i, 'password': '123'} for i in range(10000))
+
+        output_path = compressed_db.dump_backup(attachment_names=[])
+        compressed_size = os.path.getsize(output_path)
+
+        other_db = DatabaseEngine(drive, password=password)
+        other_db.create_table(['id', 'username', 'password'])
+        other_db.load_backup(output_path)
+        uncompressed_size = os.path.getsize(other_db.dump_backup(attachment_names=[]))
+
+        # Debugging
+        if debugging:
+            print(f"""
+            compressed_size: {compressed_size}
+            uncompressed_size: {uncompressed_size}
+            count_row: {other_db.count_row()}
+            """)
+
+        # Test
+        self.assertEqual(list(other_db.select()), list(compressed_db.select()))
+        self.assertLess(compressed_size, uncompressed_size // 2)
+
+    def test8_backup_names(self):
+        function_name('backup_names')
+
+        # Task
+        output_paths = [db.dump_backup(attachment_names=[]) for _ in range(3)]
+        contents = [db.list_backup_contents(output_path)['rows'] for output_path in output_paths]
+
+        # Debugging
+        if debugging:
+            print(f"""
+            output_paths: {output_paths}
+            contents: {contents}
+            """)
+
+        # Test
+        self.assertEqual(len(set(output_paths)), 3)
+        self.assertEqual(contents, [db.count_row()] * 3)
+
+    def test9_backup_temp_files(self):
+        function_name('backup_temp_files')
+
+        # Task
+        output_dir = os.path.join(drive.tempDir, 'backups')
+        os.makedirs(output_dir, exist_ok=True)
+        temp_before = sorted(os.listdir(drive.tempDir))
+
+        # Encrypted on the fly, nothing in plain is written anywhere
+        output_path = db.dump_backup(output_dir=output_dir, password='987654321')
+        temp_after = sorted(os.listdir(drive.tempDir))
+        output_files = os.listdir(output_dir)
+
+        with open(output_path, 'rb') as file:
+            data = file.read()
+
+        os.remove(output_path)
+
+        # A failed dump removes its part file and no backup appears, the attachment file is gone while writing
+        stored_path = db.write_attachment('broken', 'broken.txt', b'hello broken!', ignore_file_exists=True)
+        os.remove(stored_path)
+
+        issue = None
+        try:
+            db.dump_backup(attachment_names=['broken'], output_dir=output_dir, password='987654321')
+        except FileNotFoundError as err:
+            issue = err
+
+        failed_files = os.listdir(output_dir)
+        open(stored_path, 'wb').close()
+        db.remove_attachment('broken', 'broken.txt')
+        shutil.rmtree(output_dir)
+
+        # Debugging
+        if debugging:
+            print(f"""
+            output_path: {output_path}
+            temp_after: {temp_after}
+            output_files: {output_files}
+            issue: {issue!r}
+            failed_files: {failed_files}
+            """)
+
+        # Test
+        self.assertEqual(temp_after, temp_before)
+        self.assertEqual(output_files, [os.path.basename(output_path)])
+        self.assertNotIn(b'user1', data)
+        self.assertNotIn(b'username', data)
+        self.assertIsNotNone(issue)
+        self.assertEqual(failed_files, [])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,5 +1,6 @@
 from aesdatabase import *
 import unittest
+import lzma
 
 
 drive = DriveSetup(add_attachment=True, add_backup=True)
@@ -67,6 +68,40 @@ class MyTestCase(unittest.TestCase):
         if drive.isBackup:
             self.assertFalse(os.path.exists(drive.backupDir))
 
+    def test_compression_level(self):
+        function_name('compression_level')
+
+        # Task
+        case1 = {'compression': 'zlib', 'compression_level': 9}
+        case2 = {'compression': 'lzma', 'compression_level': 9 | lzma.PRESET_EXTREME}
+        case3 = {'compression': 'zlib', 'compression_level': 15}  # Failed case
+        case4 = {'compression': 'lzma', 'compression_level': -1}  # Failed case
+        case5 = {'compression': 'zlib', 'compression_level': '9'}  # Failed case
+
+        for case in (case1, case2, case3, case4, case5):
+            issue = ''
+
+            try:
+                DriveSetup(**case)
+                success = True
+            except error.CompressionMethodError as err:
+                issue = err
+                success = False
+
+            # Debugging
+            if debugging:
+                print(f"""
+                arguments: {case}
+                success: {success}
+                issue: {issue}
+                """)
+
+            # Test
+            if case in (case1, case2):
+                self.assertTrue(success)
+            else:
+                self.assertFalse(success)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,6 +1,7 @@
 import aescrypto.utility
 from aesdatabase import *
 import unittest
+import concurrent.futures
 
 
 drive = DriveSetup()
@@ -300,6 +301,329 @@ class MyTestCase(unittest.TestCase):
         else:
             self.assertEqual(checksum_before, checksum_after)
 
+    def test_11_create_index(self):
+        function_name('create_index')
+
+        # Task
+        for i in range(100):
+            db.insert(id=i, username='user%s' % (i % 10), password='123')
+
+        db.create_index('username')
+        rows_before = [index for index, _ in db.select(username='user3')]
+        db.edit(rows_before[0], username='other')
+        db.remove_row(rows_before[1])
+        db.insert(row_index=0, id=100, username='user3', password='123')
+        rows_after = [index for index, _ in db.select(username='user3')]
+        rows_scan = [index for index, row in db.select() if row['username'] == 'user3']
+
+        # Debugging
+        if debugging:
+            print(f"""
+            indexes: {db.indexes()}
+            rows_before: {rows_before}
+            rows_after: {rows_after}
+            """)
+
+        # Test
+        self.assertEqual(db.indexes(), ['username'])
+        self.assertAlmostEqual(len(rows_before), 10)
+        self.assertAlmostEqual(len(rows_after), 9)
+        self.assertEqual(rows_after, rows_scan)
+        self.assertTrue(db.remove_index('username'))
+        self.assertFalse(db.remove_index('username'))
+        db.clear()
+
+    def test_12_insert_many(self):
+        function_name('insert_many')
+
+        # Task
+        case1 = [{'id': 1, 'username': 'name', 'password': '123'}, {'id': 2, 'username': 'name'}]   # Failed case
+        case2 = [{'id': 1, 'username': 'name', 'password': '123'}, {'id': '2', 'username': 'name', 'password': '123'}]   # Failed case
+        case3 = [{'id': i, 'username': 'name%s' % i, 'password': '123'} for i in range(1000)]
+
+        for case in (case1, case2, case3):
+            issue = ''
+            count_before = db.count_row()
+
+            try:
+                result = db.insert_many(case)
+                success = True
+            except (error.TableTitleError, error.RowItemError) as err:
+                result = None
+                issue = err
+                success = False
+
+            count_after = db.count_row()
+
+            # Debugging
+            if debugging:
+                print(f"""
+                result: {result}
+                success: {success}
+                issue: {issue}
+                """)
+
+            # Test
+            if case is case3:
+                self.assertTrue(success)
+                self.assertAlmostEqual(result, len(case))
+                self.assertAlmostEqual(count_after, count_before + len(case))
+                self.assertEqual(list(db.select(id=999))[0][0], count_after - 1)
+            else:
+                self.assertFalse(success)
+                self.assertAlmostEqual(count_after, count_before)
+
+        db.clear()
+
+    def test_13_columnar(self):
+        function_name('columnar')
+
+        # Task
+        columnar_db = DatabaseEngine(drive, password=password, columnar=True)
+        columnar_db.create_table(['id', 'username', 'isActive', 'score'])
+        columnar_db.insert_many(
+            {'id': i, 'username': 'name%s' % (i % 3), 'isActive': i % 2 == 0, 'score': i / 2} for i in range(10)
+        )
+        columnar_db.insert(row_index=0, id=2 ** 70, username='big', isActive=False, score=0.0)
+        columnar_db.edit(1, username='edited', isActive=True)
+        columnar_db.remove_row(2)
+        columnar_db.remove_column('score')
+        rows = [row for _, row in columnar_db.select()]
+
+        # Debugging
+        if debugging:
+            print(f"""
+            isColumnar: {columnar_db.isColumnar}
+            rows: {rows}
+            """)
+
+        # Test
+        self.assertTrue(columnar_db.isColumnar)
+        self.assertAlmostEqual(len(rows), 10)
+        self.assertEqual(rows[0], {'id': 2 ** 70, 'username': 'big', 'isActive': False})
+        self.assertEqual(rows[1], {'id': 0, 'username': 'edited', 'isActive': True})
+        self.assertEqual(rows[2], {'id': 2, 'username': 'name2', 'isActive': True})
+        self.assertIs(rows[3]['isActive'], False)
+
+    def test_14_select_rows(self):
+        function_name('select_rows')
+
+        # Task
+        db.insert_many({'id': i, 'username': 'name%s' % (i % 2), 'password': '123'} for i in range(10))
+        rows = [row for _, row in db.select_rows(['id', 'username'], password='123', username='name1')]
+        values = [item for _, item in db.select_values('id', username='name1')]
+        all_values = [item for _, item in db.select_values('id')]
+
+        # Debugging
+        if debugging:
+            print(f"""
+            rows: {rows}
+            values: {values}
+            all_values: {all_values}
+            """)
+
+        # Test
+        self.assertAlmostEqual(len(rows), 5)
+        self.assertIsInstance(rows[0], tuple)
+        self.assertEqual(rows[0], (1, 'name1'))
+        self.assertEqual(rows[0].username, 'name1')
+        self.assertEqual(rows[0].as_dict(), {'id': 1, 'username': 'name1'})
+        self.assertRaises(AttributeError, getattr, rows[0], 'password')
+        self.assertEqual(values, [row.id for row in rows])
+        self.assertEqual(all_values, list(range(10)))
+        db.clear()
+
+    def test_15_select_where(self):
+        function_name('select_where')
+
+        # Task
+        db.insert_many({'id': i, 'username': 'name%s' % i, 'password': str(i % 5)} for i in range(100))
+        db.create_index('password')
+
+        case1 = {'where': 'id > 10'}   # Failed case
+        case2 = {'where': (Col('id') >= 90) & Col('username').startswith('name9')}
+        case3 = {'where': Col('password').isin(['1', '2']) | (Col('id') == 0), 'order_by': 'id', 'reverse': True}
+        case4 = {'where': ~Col('id').between(10, 89), 'order_by': ['password', 'id'], 'limit': 3, 'offset': 1}
+
+        for case in (case1, case2, case3, case4):
+            issue = ''
+            rows = []
+
+            try:
+                for index, row in db.select(**case):
+                    rows.append(row['id'])
+                success = True
+            except error.QueryError as err:
+                issue = err
+                success = False
+
+            # Debugging
+            if debugging:
+                print(f"""
+                arguments: {case}
+                rows: {rows}
+                success: {success}
+                issue: {issue}
+                """)
+
+            # Test
+            if case is case1:
+                self.assertFalse(success)
+            elif case is case2:
+                self.assertEqual(rows, list(range(90, 100)))
+            elif case is case3:
+                self.assertEqual(rows, sorted([i for i in range(100) if i % 5 in (1, 2) or i == 0], reverse=True))
+            elif case is case4:
+                self.assertEqual(rows, [5, 90, 95])
+
+        db.remove_index('password')
+        db.clear()
+
+    def test_16_ordered_index(self):
+        function_name('ordered_index')
+
+        # Task
+        db.insert_many({'id': (i * 7) % 100, 'username': 'name%s' % i, 'password': '123'} for i in range(100))
+        db.create_index('id', ordered=True)
+        db.insert(row_index=0, id=-1, username='first', password='123')
+        db.remove_row(50)
+        db.edit(10, id=1000)
+
+        case1 = {'where': Col('id').between(20, 29)}
+        case2 = {'where': Col('id') > 95}
+        case3 = {'where': Col('username').startswith('name9') & (Col('id') < 50)}
+        case4 = {'order_by': 'id', 'reverse': True, 'limit': 3}
+
+        all_rows = [(index, row) for index, row in db.select()]
+        expected_rows = (
+            [index for index, row in all_rows if 20 <= row['id'] <= 29],
+            [index for index, row in all_rows if row['id'] > 95],
+            [index for index, row in all_rows if row['username'].startswith('name9') and row['id'] < 50],
+            [index for index, row in sorted(all_rows, key=lambda item: item[1]['id'], reverse=True)[:3]],
+        )
+
+        for case, expected in zip((case1, case2, case3, case4), expected_rows):
+            rows = [index for index, row in db.select(**case)]
+
+            # Debugging
+            if debugging:
+                print(f"""
+                arguments: {case}
+                rows: {rows}
+                """)
+
+            # Test
+            self.assertEqual(rows, expected)
+
+        self.assertAlmostEqual(db.min_value('id'), -1)
+        self.assertAlmostEqual(db.max_value('id'), 1000)
+        db.remove_index('id')
+        db.clear()
+        self.assertIsNone(db.min_value('id'))
+
+    def test_17_tables(self):
+        function_name('tables')
+
+        # Task
+        case1 = {'name': 'users'}
+        case2 = {'name': 'orders'}
+        case3 = {'name': '../users'}   # Failed case
+
+        for case in (case1, case2):
+            table = db.table(**case)
+            table.create_table(['id', case['name']])
+            table.insert_many({'id': i, case['name']: '%s%s' % (case['name'], i)} for i in range(10))
+            table.dump()
+
+        try:
+            db.table(**case3)
+            success = True
+        except error.TableNameError:
+            success = False
+
+        # Another engine opens the tables lazily, only the accessed table is loaded
+        other_db = DatabaseEngine(drive, password=password)
+        names = other_db.tables()
+        users = other_db.table('users')
+        rows = [row for _, row in users.select(id=3)]
+
+        removed = other_db.remove_table('orders')
+        names_after = other_db.tables()
+        other_db.remove_table('users')
+
+        # Debugging
+        if debugging:
+            print(f"""
+            success: {success}
+            names: {names}
+            rows: {rows}
+            removed: {removed}
+            names_after: {names_after}
+            """)
+
+        # Test
+        self.assertFalse(success)
+        self.assertEqual(names, ['orders', 'users'])
+        self.assertEqual(rows, [{'id': 3, 'users': 'users3'}])
+        self.assertTrue(removed)
+        self.assertEqual(names_after, ['users'])
+        self.assertEqual(db.count_row(), 0)
+
+    def test_18_thread_safe(self):
+        function_name('thread_safe')
+
+        # Task
+        safe_db = DatabaseEngine(drive, password=password, thread_safe=True)
+        safe_db.create_table(['id', 'balance'])
+        safe_db.insert_many({'id': i, 'balance': 100} for i in range(100))
+        safe_db.create_index('id')
+        total = 100 * 100
+
+        def transfer(count: int):
+            for i in range(count):
+                # Both edits are seen together by readers
+                with safe_db.lock.write():
+                    _, source = next(safe_db.select(id=i % 100))
+                    safe_db.edit(i % 100, balance=source['balance'] - 1)
+                    _, target = next(safe_db.select(id=(i + 1) % 100))
+                    safe_db.edit((i + 1) % 100, balance=target['balance'] + 1)
+
+        def read_totals(count: int) -> set:
+            totals = set()
+
+            for _ in range(count):
+                totals.add(sum(row['balance'] for _, row in safe_db.select()))
+                totals.add(sum(value for _, value in safe_db.select_values('balance')))
+
+            return totals
+
+        with concurrent.futures.ThreadPoolExecutor(5) as executor:
+            writer = executor.submit(transfer, 2000)
+            readers = [executor.submit(read_totals, 200) for _ in range(4)]
+            totals = set().union(*(reader.result() for reader in readers))
+            writer.result()
+
+        # A read lock can't become a write lock, it would wait for itself
+        try:
+            with safe_db.lock.read():
+                safe_db.insert(id=100, balance=0)
+            upgraded = True
+        except RuntimeError:
+            upgraded = False
+
+        # Debugging
+        if debugging:
+            print(f"""
+            totals: {totals}
+            upgraded: {upgraded}
+            count_row: {safe_db.count_row()}
+            """)
+
+        # Test
+        self.assertEqual(totals, {total})
+        self.assertFalse(upgraded)
+        self.assertEqual(safe_db.count_row(), 100)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,539 @@
+from aesdatabase import *
+import unittest
+import tracemalloc
+import concurrent.futures
+
+
+drive = DriveSetup()
+drive.create()
+
+password = '123456789'  # Set None for test without encryption
+db = DatabaseEngine(drive, password=password, journal=True)
+
+database_path = drive.databasePath
+if password:
+    database_path = aescrypto.utility.add_extension(database_path)
+
+debugging = True
+
+
+def function_name(text: str):
+    print(f"[ + ] Start for: {text}")
+
+
+class MyTestCase(unittest.TestCase):
+    def test1_journal_dump(self):
+        function_name('journal_dump')
+
+        # Task
+        db.create_table(['id', 'username', 'password'])
+        db.insert_many({'id': i, 'username': 'user%s' % i, 'password': '123'} for i in range(1000))
+        db.dump()
+
+        checksum_before = aescrypto.utility.checksum(database_path)
+        journal_before = os.path.getsize(drive.journalPath)
+
+        db.insert(id=1000, username='user1000', password='123')
+        db.edit(0, username='edited')
+        db.remove_row(1)
+        db.dump()
+
+        checksum_after = aescrypto.utility.checksum(database_path)
+        journal_after = os.path.getsize(drive.journalPath)
+
+        # Debugging
+        if debugging:
+            print(f"""
+            checksum_before: {checksum_before}
+            checksum_after: {checksum_after}
+            journal_before: {journal_before}
+            journal_after: {journal_after}
+            """)
+
+        # Test
+        self.assertEqual(checksum_before, checksum_after)
+        self.assertGreater(journal_after, journal_before)
+
+    def test2_journal_load(self):
+        function_name('journal_load')
+
+        # Task
+        other_db = DatabaseEngine(drive, password=password, journal=True)
+        result = other_db.load()
+        rows = [row for _, row in other_db.select()]
+
+        # Debugging
+        if debugging:
+            print(f"""
+            result: {result}
+            count_row: {other_db.count_row()}
+            first_rows: {rows[:2]}
+            """)
+
+        # Test
+        self.assertTrue(result)
+        self.assertEqual(rows, [row for _, row in db.select()])
+        self.assertEqual(rows[0]['username'], 'edited')
+        self.assertEqual(rows[1]['id'], 2)
+        self.assertEqual(rows[-1]['id'], 1000)
+
+    def test3_compact(self):
+        function_name('compact')
+
+        # Task
+        checksum_before = aescrypto.utility.checksum(database_path)
+        journal_before = os.path.getsize(drive.journalPath)
+        db.compact()
+        checksum_after = aescrypto.utility.checksum(database_path)
+        journal_after = os.path.getsize(drive.journalPath)
+
+        other_db = DatabaseEngine(drive, password=password)
+        other_db.load()
+
+        # Debugging
+        if debugging:
+            print(f"""
+            checksum_before: {checksum_before}
+            checksum_after: {checksum_after}
+            journal_before: {journal_before}
+            journal_after: {journal_after}
+            """)
+
+        # Test
+        self.assertNotEqual(checksum_before, checksum_after)
+        self.assertLess(journal_after, journal_before)
+        self.assertEqual(list(other_db.select()), list(db.select()))
+
+    def test4_stream_load(self):
+        function_name('stream_load')
+
+        # Task
+        db.insert_many({'id': i, 'username': 'user%s' % i, 'password': '123'} for i in range(1001, 80000))
+        db.compact()
+
+        other_db = DatabaseEngine(drive, password=password)
+        result = other_db.load()
+
+        corrupted = False
+        if password:
+            with open(database_path, 'r+b') as file:
+                file.seek(os.path.getsize(database_path) // 2)
+                byte = file.read(1)
+                file.seek(-1, os.SEEK_CUR)
+                file.write(bytes([byte[0] ^ 0xff]))
+
+            try:
+                DatabaseEngine(drive, password=password).load()
+            except error.WrongKeyError:
+                corrupted = True
+
+        # Debugging
+        if debugging:
+            print(f"""
+            result: {result}
+            count_row: {other_db.count_row()}
+            file_size: {os.path.getsize(database_path)}
+            corrupted: {corrupted}
+            """)
+
+        # Test
+        self.assertTrue(result)
+        self.assertEqual(list(other_db.select()), list(db.select()))
+        self.assertEqual(corrupted, bool(password))
+
+    def test5_atomic_dump(self):
+        function_name('atomic_dump')
+
+        # Task
+        db.compact()
+        checksum_before = aescrypto.utility.checksum(database_path)
+
+        # Rows can't be pickled, the dump fails in the middle of writing
+        other_db = DatabaseEngine(drive, password=password)
+        other_db.create_table(['id', 'callback'])
+        other_db.insert_many({'id': i, 'callback': lambda: None} for i in range(10))
+
+        failed = False
+        try:
+            other_db.dump()
+        except (pickle.PicklingError, AttributeError, TypeError):
+            failed = True
+
+        checksum_after = aescrypto.utility.checksum(database_path)
+        temp_files = [
+            file_name for file_name in os.listdir(drive.databaseDir)
+            if file_name.startswith('%s.' % os.path.basename(database_path))
+            and file_name not in (os.path.basename(drive.journalPath), os.path.basename(drive.lockPath))
+        ]
+
+        # Debugging
+        if debugging:
+            print(f"""
+            failed: {failed}
+            checksum_before: {checksum_before}
+            checksum_after: {checksum_after}
+            temp_files: {temp_files}
+            """)
+
+        # Test
+        self.assertTrue(failed)
+        self.assertEqual(checksum_before, checksum_after)
+        self.assertEqual(temp_files, [])
+
+    def test6_compressed_dump(self):
+        function_name('compressed_dump')
+
+        # Task
+        compressed_drive = DriveSetup(compression='lzma')
+        compressed_drive.database_update(folder='compressed')
+        compressed_drive.create()
+
+        compressed_db = DatabaseEngine(compressed_drive, password=password)
+        compressed_db.create_table(['id', 'username', 'password'])
+        compressed_db.insert_many(row for _, row in db.select())
+        compressed_db.dump()
+
+        compressed_path = compressed_drive.databasePath
+        if password:
+            compressed_path = aescrypto.utility.add_extension(compressed_path)
+
+        # Compression is detected by the file header, the drive setting is for dump only
+        other_drive = DriveSetup()
+        other_drive.database_update(folder='compressed')
+        other_db = DatabaseEngine(other_drive, password=password)
+        result = other_db.load()
+
+        # Debugging
+        if debugging:
+            print(f"""
+            result: {result}
+            size: {os.path.getsize(database_path)}
+            compressed_size: {os.path.getsize(compressed_path)}
+            """)
+
+        # Test
+        self.assertTrue(result)
+        self.assertLess(os.path.getsize(compressed_path), os.path.getsize(database_path) // 2)
+        self.assertEqual(list(other_db.select()), list(db.select()))
+
+        compressed_drive.delete()
+
+    def test7_paged_load(self):
+        function_name('paged_load')
+
+        # Task
+        paged_drive = DriveSetup()
+        paged_drive.database_update(folder='paged')
+        paged_drive.create()
+
+        paged_db = DatabaseEngine(paged_drive, password=password, paged=True)
+        paged_db.create_table(['id', 'username', 'password'])
+        paged_db.insert_many({'id': i, 'username': 'user%s' % i, 'password': '123'} for i in range(50000))
+        paged_db.create_index('id', ordered=True)
+        paged_db.create_index('username')
+        paged_db.dump()
+
+        # Opening reads the directory only, rows and indexes are read on demand
+        start = time.perf_counter()
+        other_db = DatabaseEngine(paged_drive, password=password)
+        result = other_db.load()
+        load_time = time.perf_counter() - start
+
+        row = next(other_db.select(username='user40000'))
+        between = [index for index, _ in other_db.select(where=(Col('id') >= 100) & (Col('id') <= 104))]
+
+        # Unchanged pages are copied as they are, changed pages are written again
+        other_db.edit(1, username='edited')
+        other_db.remove_row(0)
+        other_db.dump()
+
+        reloaded_db = DatabaseEngine(paged_drive, password=password)
+        reloaded_db.load()
+        reloaded_rows = list(reloaded_db.select())
+        expected_rows = list(other_db.select())
+
+        # Debugging
+        if debugging:
+            print(f"""
+            result: {result}
+            is_paged: {other_db.isPaged}
+            load_time: {load_time * 1000:.3f} ms
+            row: {row}
+            between: {between}
+            count_row: {reloaded_db.count_row()}
+            """)
+
+        # Test
+        self.assertTrue(result)
+        self.assertTrue(other_db.isPaged)
+        self.assertEqual(other_db.count_row(), 49999)
+        self.assertEqual(row, (40000, {'id': 40000, 'username': 'user40000', 'password': '123'}))
+        self.assertEqual(between, [100, 101, 102, 103, 104])
+        self.assertEqual(reloaded_rows, expected_rows)
+        self.assertEqual(reloaded_rows[0][1]['username'], 'edited')
+        self.assertEqual(reloaded_db.indexes(), other_db.indexes())
+
+        paged_drive.delete()
+
+    def test8_page_cache(self):
+        function_name('page_cache')
+
+        # Task
+        paged_drive = DriveSetup()
+        paged_drive.database_update(folder='cached')
+        paged_drive.create()
+
+        paged_db = DatabaseEngine(paged_drive, password=password, paged=True)
+        paged_db.create_table(['id', 'username', 'password'])
+        paged_db.insert_many({'id': i, 'username': 'user%s' % i, 'password': '123'} for i in range(50000))
+        paged_db.create_index('id')
+        paged_db.dump()
+
+        # A budget smaller than the table, a full scan keeps the most recent pages only
+        budget = 1024 * 1024
+        other_db = DatabaseEngine(paged_drive, password=password, cache_bytes=budget)
+        other_db.load()
+
+        # Pages are charged by their size in memory, not by their smaller pickled size
+        tracemalloc.start()
+        count = sum(1 for _ in other_db.select())
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        scan_info = other_db.cache_info()
+
+        # The index finds the row in the last read page
+        _, row = next(other_db.select(id=49999))
+        repeated_info = other_db.cache_info()
+
+        other_db.clear_page_cache()
+        cleared_info = other_db.cache_info()
+
+        # Debugging
+        if debugging:
+            print(f"""
+            count: {count}
+            memory: {memory}
+            scan_info: {scan_info}
+            repeated_info: {repeated_info}
+            cleared_info: {cleared_info}
+            """)
+
+        # Test
+        self.assertEqual(count, 50000)
+        self.assertEqual(row['username'], 'user49999')
+        self.assertLessEqual(scan_info['size'], budget)
+        self.assertLess(memory, budget * 2)
+        self.assertGreater(scan_info['pages'], 1)
+        self.assertLess(scan_info['pages'], 50000 // header.pageRows)
+        self.assertEqual(scan_info['misses'], -(-50000 // header.pageRows))
+        self.assertGreater(repeated_info['hits'], scan_info['hits'])
+        self.assertEqual(repeated_info['misses'], scan_info['misses'])
+        self.assertEqual((cleared_info['pages'], cleared_info['hits'], cleared_info['misses']), (0, 0, 0))
+
+        paged_drive.delete()
+
+    def test9_multiprocess_dump(self):
+        function_name('multiprocess_dump')
+
+        # Task
+        shared_db = DatabaseEngine(drive, password=password, journal=True)
+        shared_db.load()
+        count_before = shared_db.count_row()
+        unchanged = shared_db.reload()
+
+        # Processes insert into the same database, each change is made on the latest data
+        with concurrent.futures.ProcessPoolExecutor(4) as executor:
+            list(executor.map(insert_rows, [25] * 4))
+
+        changed = shared_db.changed()
+        reloaded = shared_db.reload()
+        count_after = shared_db.count_row()
+        ids = [row['id'] for _, row in shared_db.select() if row['username'] == 'process']
+
+        temp_files = [file_name for file_name in os.listdir(drive.databaseDir) if file_name.endswith('.tmp')]
+
+        # Debugging
+        if debugging:
+            print(f"""
+            count_before: {count_before}
+            unchanged: {unchanged}
+            changed: {changed}
+            reloaded: {reloaded}
+            count_after: {count_after}
+            temp_files: {temp_files}
+            """)
+
+        # Test
+        self.assertFalse(unchanged)
+        self.assertTrue(changed)
+        self.assertTrue(reloaded)
+        self.assertFalse(shared_db.changed())
+        self.assertEqual(count_after, count_before + 100)
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertEqual(temp_files, [])
+
+    def test_10_paged_stored_indexes(self):
+        function_name('paged_stored_indexes')
+
+        # Task
+        paged_drive = DriveSetup()
+        paged_drive.database_update(folder='indexed')
+        paged_drive.create()
+
+        paged_db = DatabaseEngine(paged_drive, password=password, paged=True)
+        paged_db.create_table(['id', 'username', 'password'])
+        paged_db.insert_many({'id': i, 'username': 'user%s' % i, 'password': '123'} for i in range(50000))
+        paged_db.create_index('id')
+        paged_db.create_index('username', ordered=True)
+        paged_db.dump()
+
+        # Changes keep the stored indexes up to date, unchanged pages are not read
+        other_db = DatabaseEngine(paged_drive, password=password)
+        other_db.load()
+        other_db.edit(5, username='edited')
+        other_db.remove_row(10)
+        other_db.insert(row_index=20, id=-1, username='inserted', password='123')
+        other_db.dump()
+        info = other_db.cache_info()
+
+        edited = [row_index for row_index, _ in other_db.select(username='edited')]
+        inserted = [row_index for row_index, _ in other_db.select(id=-1)]
+        last = [row_index for row_index, _ in other_db.select(id=49999)]
+
+        # Debugging
+        if debugging:
+            print(f"""
+            info: {info}
+            edited: {edited}
+            inserted: {inserted}
+            last: {last}
+            """)
+
+        # Test
+        self.assertLessEqual(info['misses'], 2)
+        self.assertEqual(edited, [5])
+        self.assertEqual(inserted, [20])
+        self.assertEqual(last, [49999])
+
+        paged_drive.delete()
+
+    def test_11_forged_journal(self):
+        function_name('forged_journal')
+
+        # Task
+        forged_drive = DriveSetup()
+        forged_drive.database_update(folder='forged')
+        forged_drive.create()
+
+        forged_db = DatabaseEngine(forged_drive, password=password, journal=True)
+        forged_db.create_table(['id', 'username', 'password'])
+        forged_db.insert_many({'id': i, 'username': 'user%s' % i, 'password': '123'} for i in range(100))
+        forged_db.dump()
+        forged_db.edit(0, username='first')
+        forged_db.dump()
+
+        with open(forged_drive.journalPath, 'rb') as file:
+            first_journal = file.read()
+
+        forged_db.compact()
+        with open(forged_drive.journalPath, 'rb') as file:
+            header = file.read(len(b'AESDatabaseJournal') + 1 + 16)
+
+        # Records of another snapshot relabeled with the current generation
+        relabeled = header + first_journal[len(header):]
+
+        # Records written without the key
+        record = pickle.dumps(('edit', 0, ['forged']))
+        plain = header[:len(b'AESDatabaseJournal')] + b'\x00' + header[-16:] + struct.pack('<I', len(record)) + record
+
+        issues = []
+        for journal in (relabeled, plain):
+            with open(forged_drive.journalPath, 'wb') as file:
+                file.write(journal)
+
+            try:
+                DatabaseEngine(forged_drive, password=password, journal=True).load()
+                issues.append(None)
+            except error.WrongKeyError as err:
+                issues.append(err)
+
+        forged_drive.delete()
+
+        # Debugging
+        if debugging:
+            print(f"""
+            issues: {issues}
+            """)
+
+        # Test
+        if password:
+            self.assertIsInstance(issues[0], error.WrongKeyError)
+            self.assertIsInstance(issues[1], error.WrongKeyError)
+
+    def test_12_forged_pages(self):
+        function_name('forged_pages')
+
+        # Task
+        forged_drive = DriveSetup()
+        forged_drive.database_update(folder='forged')
+        forged_drive.create()
+
+        # A paged file written without the key in place of the encrypted one
+        plain_db = DatabaseEngine(forged_drive, paged=True)
+        plain_db.create_table(['id', 'username', 'password'])
+        plain_db.insert_many({'id': i, 'username': 'forged%s' % i, 'password': '123'} for i in range(100))
+        plain_db.dump()
+
+        with open(forged_drive.databasePath, 'rb') as file:
+            plain = file.read()
+
+        forged_db = DatabaseEngine(forged_drive, password='987654321', paged=True)
+        forged_db.create_table(['id', 'username', 'password'])
+        forged_db.insert_many({'id': i, 'username': 'user%s' % i, 'password': '123'} for i in range(100))
+        forged_db.dump()
+
+        forged_path = aescrypto.utility.add_extension(forged_drive.databasePath)
+        with open(forged_path, 'rb') as file:
+            encrypted = bytearray(file.read())
+
+        # The encrypted flag is changed in the header
+        flag_offset = len(forged_drive.databaseSignature) + 1
+        encrypted[flag_offset] = 2
+
+        issues = []
+        for data in (plain, encrypted):
+            with open(forged_path, 'wb') as file:
+                file.write(data)
+
+            try:
+                DatabaseEngine(forged_drive, password='987654321').load()
+                issues.append(None)
+            except error.WrongKeyError as err:
+                issues.append(err)
+
+        forged_drive.delete()
+
+        # Debugging
+        if debugging:
+            print(f"""
+            issues: {issues}
+            """)
+
+        # Test
+        self.assertIsInstance(issues[0], error.WrongKeyError)
+        self.assertIsInstance(issues[1], error.WrongKeyError)
+
+
+def insert_rows(count: int):
+    process_db = DatabaseEngine(drive, password=password, journal=True)
+    process_db.load()
+
+    for _ in range(count):
+        with process_db.fileLock.exclusive():
+            process_db.reload()
+            process_db.insert(id=process_db.count_row(), username='process', password=str(os.getpid()))
+            process_db.dump()
+
+
+if __name__ == '__main__':
+    unittest.main()